@@ -14,8 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import random
-from locust import FastHttpUser, TaskSet, between
+from locust import FastHttpUser, HttpUser, TaskSet, between, events, task
 from faker import Faker
 import datetime
 fake = Faker()
@@ -90,3 +91,105 @@ class UserBehavior(TaskSet):
 class WebsiteUser(FastHttpUser):
     tasks = [UserBehavior]
     wait_time = between(1, 10)
+
+
+# nanobananaservice (AI endpoints). Opt-in with NANOBANANA_LOAD=1, since every
+# task but the product search calls Gemini. Run it alone with
+#   NANOBANANA_LOAD=1 locust NanoBananaUser
+NANOBANANA_URL = "http://" + os.getenv("NANOBANANA_ADDR", "nanobananaservice:8080")
+NANOBANANA_IMAGES_DIR = os.getenv(
+    "NANOBANANA_IMAGES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nanobananaservice", "images"))
+NANOBANANA_ENDPOINTS = [
+    "/products-name/[name]",
+    "/describe-image",
+    "/assistant-fashion",
+    "/sell-product-from-query",
+    "/remix-images",
+]
+
+product_names = ['Sunglasses', 'Tank Top', 'Watch', 'Loafers', 'Hairdryer',
+    'Candle Holder', 'Salt & Pepper Shakers', 'Bamboo Glass Jar', 'Mug']
+
+sell_queries = [
+    'Gostei muito desses óculos de sol, posso experimentar?',
+    'Quero ver como fico com esse relógio',
+    'Adorei essa regata!',
+    'Esses mocassins combinam comigo?',
+    'I really like sunglasses, can you help me?',
+    'Show me with the watch on',
+    'Quero algum acessório bonito',
+]
+
+def load_sample_images():
+    images = []
+    if os.path.isdir(NANOBANANA_IMAGES_DIR):
+        for name in sorted(os.listdir(NANOBANANA_IMAGES_DIR)):
+            if name.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
+                with open(os.path.join(NANOBANANA_IMAGES_DIR, name), 'rb') as f:
+                    images.append((name, f.read()))
+    return images
+
+sample_images = load_sample_images()
+
+def image_file(field, image=None):
+    name, data = image or random.choice(sample_images)
+    content_type = 'image/png' if name.lower().endswith('.png') else 'image/jpeg'
+    return {field: (name, data, content_type)}
+
+class NanoBananaUser(HttpUser):
+    abstract = os.getenv("NANOBANANA_LOAD", "0") != "1"
+    # users look at each generated answer before the next one
+    wait_time = between(5, 20)
+
+    def __init__(self, environment):
+        # not the frontend given with --host
+        self.host = NANOBANANA_URL
+        super().__init__(environment)
+
+    def on_start(self):
+        if not sample_images:
+            raise RuntimeError(f"No sample images in {NANOBANANA_IMAGES_DIR}")
+
+    @task(10)
+    def products_by_name(self):
+        self.client.get("/products-name/" + random.choice(product_names),
+            name="/products-name/[name]")
+
+    @task(4)
+    def describe_image(self):
+        self.client.post("/describe-image",
+            params={'type_prompt': random.choice(['product', 'person'])},
+            files=image_file('image'), name="/describe-image", timeout=120)
+
+    @task(3)
+    def assistant_fashion(self):
+        self.client.post("/assistant-fashion", files=image_file('image'), timeout=120)
+
+    @task(2)
+    def sell_product_from_query(self):
+        self.client.post("/sell-product-from-query",
+            data={'text': random.choice(sell_queries)},
+            files=image_file('image'), timeout=180)
+
+    @task(1)
+    def remix_images(self):
+        first, second = random.sample(sample_images, 2) if len(sample_images) > 1 \
+            else (sample_images[0], sample_images[0])
+        files = {**image_file('image1', first), **image_file('image2', second)}
+        self.client.post("/remix-images",
+            data={'prompt': 'Create a natural blend of both images.'},
+            files=files, timeout=180)
+
+@events.quitting.add_listener
+def report_nanobanana_percentiles(environment, **kwargs):
+    """Prints latency percentiles of the AI endpoints, for capacity planning."""
+    for name in NANOBANANA_ENDPOINTS:
+        entry = environment.stats.entries.get((name, "GET" if name.startswith("/products") else "POST"))
+        if entry is None or not entry.num_requests:
+            continue
+        print(f"{name:<26} n={entry.num_requests:<6} failures={entry.num_failures:<5} "
+            f"p50={entry.get_response_time_percentile(0.5):.0f}ms "
+            f"p90={entry.get_response_time_percentile(0.9):.0f}ms "
+            f"p95={entry.get_response_time_percentile(0.95):.0f}ms "
+            f"p99={entry.get_response_time_percentile(0.99):.0f}ms")
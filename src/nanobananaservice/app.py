@@ -1,7 +1,20 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import Response
-from src.image_service import remix_images_service, describe_image_service, ImageSellProductService
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from src.image_service import remix_images_service_async, describe_image_service_async, ImageRemixService, ImageSellProductService
+from src.grpc_pool import ChannelPool
+from src.genai_clients import client_registry
+from src.model_limits import model_limiter
+from src.response_cache import ResponseCache, cache_key
+from src.stage_timings import StageTimings
+from src.uploads import BodySizeLimitMiddleware, read_image_upload, detach_upload, read_detached, MAX_BATCH_REQUEST_BYTES, MAX_UPLOAD_BYTES
+from src.image_preprocess import image_preprocessor
+from src.mime import UnsupportedImageError
+from src.catalog_cache import CatalogCache, product_to_dict, dump_json, make_etag, etag_matches
+from src.product_images import ProductImageStore
+from src.product_classifier import product_choice
+from src.batch_describe import describe_batch, iter_archive, BATCH_MAX_CONCURRENCY
 from contextlib import asynccontextmanager 
+from typing import List, Optional, Tuple
 from fastapi.middleware.cors import CORSMiddleware 
 
 from prompts.describe_product import prompt as prompt_product
@@ -12,11 +25,12 @@ from prompts.search_and_sell_product_fashion import prompt as prompt_sell_produc
 
 from io import BytesIO
 import base64
+import json
 
-import grpc
 import demo_pb2_grpc
 import demo_pb2
 
+import asyncio
 import uuid
 import time
 
@@ -27,41 +41,58 @@ import os
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     
-    global channel, stub
-    global cart_channel, cart_stub
-    global email_channel, email_stub
+    global catalog_pool, stub, catalog_cache, product_images
+    global cart_pool, cart_stub
+    global email_pool, email_stub
+    
+    # before any gRPC channel or thread exists
+    image_preprocessor.start()
     
     # ProductCatalogService connection
     # host = "[::]:3550"  # Atualize com o host e porta corretos do seu serviço gRPC
     # host = 'localhost:3550'
     host = os.getenv('PRODUCT_CATALOG_SERVICE_ADDR', 'productcatalogservice:3550')
-    channel = grpc.insecure_channel(host)
-    stub = demo_pb2_grpc.ProductCatalogServiceStub(channel)
+    catalog_pool = ChannelPool(host)
+    stub = catalog_pool.stub(demo_pb2_grpc.ProductCatalogServiceStub)
+    catalog_cache = CatalogCache(stub)
+    # product pictures are loaded into memory with every new catalog snapshot
+    product_images = ProductImageStore()
+    catalog_cache.add_listener(product_images.load)
+    # products the user can pick, with the classifier vocabulary and LLM schema
+    catalog_cache.add_listener(product_choice.load)
+    catalog_cache.start()
     
     # CartService connection
     cart_host = os.getenv('CART_SERVICE_ADDR', 'cartservice:7070')
-    cart_channel = grpc.insecure_channel(cart_host)
-    cart_stub = demo_pb2_grpc.CartServiceStub(cart_channel)
+    cart_pool = ChannelPool(cart_host)
+    cart_stub = cart_pool.stub(demo_pb2_grpc.CartServiceStub)
     
     # EmailService connection
     email_host = os.getenv('EMAIL_SERVICE_ADDR', 'emailservice:5000')
-    email_channel = grpc.insecure_channel(email_host)
-    email_stub = demo_pb2_grpc.EmailServiceStub(email_channel)
+    email_pool = ChannelPool(email_host)
+    email_stub = email_pool.stub(demo_pb2_grpc.EmailServiceStub)
     
-    print("gRPC channels and stubs created (ProductCatalog, Cart, Email).")
+    print(f"gRPC channel pools created (ProductCatalog, Cart, Email), {catalog_pool.size} channels each.")
     
     yield  # <- necessário para funcionar como async generator
     
     print("Shutting down gRPC channels.")
-    channel.close()
-    cart_channel.close()
-    email_channel.close()
+    catalog_cache.stop()
+    image_preprocessor.shutdown()
+    catalog_pool.close()
+    cart_pool.close()
+    email_pool.close()
     
 
 app = FastAPI(title="Nano Banana Service", 
               description="AI-powered fashion and image remixing service using Gemini AI",
               lifespan=lifespan)
 
+# Reject oversized request bodies (413) before they are spooled;
+# added first so CORS (added last, outermost) also wraps these responses
+app.add_middleware(BodySizeLimitMiddleware,
+                   path_limits={"/describe-images": MAX_BATCH_REQUEST_BYTES})
+
 # Allow all origins (CORS)
 app.add_middleware(
     CORSMiddleware,
@@ -69,6 +100,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache", "X-Image-ID"],
 )
 
 # Root route
@@ -77,65 +109,98 @@ def read_root():
     return {"message": "Nano Banana Service is running!"}
 
 
+def cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Returns pre-serialized JSON, or 304 if the client already has this ETag."""
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Route to list all products
 @app.get("/products")
-def get_products():
+def get_products(request: Request):
     try:
-        response = stub.ListProducts(demo_pb2.Empty())
-        products = []
-        # print(response)
-        for product in response.products:
-            products.append({
-                "id": str(product.id),
-                "name": str(product.name),
-                "description": str(product.description),
-                "price": str(product.price_usd.units),
-                "picture": str(product.picture),
-                "categories": [str(category) for category in product.categories]
-            })
-        return {"products": products}
+        snapshot = catalog_cache.get()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
+    return cached_json_response(request, snapshot.list_json, snapshot.etag)
 
 # Route to search product by ID
 @app.get("/products/{product_id}")
-def get_product_by_id(product_id: str):
+def get_product_by_id(product_id: str, request: Request):
     try:
-        product = stub.GetProduct(demo_pb2.GetProductRequest(id=product_id))
-        return {
-            "id": str(product.id),
-            "name": str(product.name),
-            "description": str(product.description),
-            "price": str(product.price_usd.units),
-            "picture": str(product.picture)
-        }
+        product = catalog_cache.get().get(product_id)
+        if product is None:
+            # not in the snapshot yet, ask the catalog directly
+            product = product_to_dict(stub.GetProduct(demo_pb2.GetProductRequest(id=product_id)))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Product not found: {str(e)}")
+    body = dump_json({key: product[key] for key in ("id", "name", "description", "price", "picture")})
+    return cached_json_response(request, body, make_etag(body))
 
-# Route to search product by name
+# Route to search product by name (case-insensitive)
 @app.get("/products-name/{name}")
-def get_product_by_name(name: str):
+def get_product_by_name(name: str, request: Request):
     try:
-        response = stub.ListProducts(demo_pb2.Empty())
-        products = []
-
-        for product in response.products:
-            if product.name == name:
-                products.append({
-                    "id": str(product.id),
-                    "name": str(product.name),
-                    "description": str(product.description),
-                    "price": str(product.price_usd.units),
-                    "picture": str(product.picture),
-                    "categories": [str(category) for category in product.categories]
-                })
-        # print(products)
-        return {"products": products}
+        products = catalog_cache.get().find_by_name(name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching products: {str(e)}")
+    body = dump_json({"products": products})
+    return cached_json_response(request, body, make_etag(body))
+
+def sse_event(event: str, data: dict) -> bytes:
+    """Formats one server-sent event; json.dumps keeps the payload on one line."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+async def remix_event_stream(parts, image_id: str):
+    """SSE body: `text` events as text parts arrive, `image` events (base64), then `done`."""
+    try:
+        async for part in parts:
+            if part.text:
+                yield sse_event("text", {"text": part.text})
+            elif part.inline_data and part.inline_data.data:
+                yield sse_event("image", {
+                    "mime_type": part.inline_data.mime_type or "image/png",
+                    "data": base64.b64encode(part.inline_data.data).decode("ascii")
+                })
+        yield sse_event("done", {"image_id": image_id})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Processing error: {str(e)}"})
+
+async def stream_remixed_image(parts, image_id: str) -> StreamingResponse:
+    """Streams the first image part as soon as the model sends it, without buffering."""
+    image_part = None
+    async for part in parts:
+        if part.inline_data and part.inline_data.data:
+            image_part = part.inline_data
+            break
+    # the rest of the model stream is not needed
+    await parts.aclose()
+    if image_part is None:
+        raise ValueError("No image found in streaming response")
+
+    async def body():
+        yield image_part.data
+
+    return StreamingResponse(
+        body(),
+        media_type=image_part.mime_type or "image/png",
+        headers={
+            "Content-Disposition": f"attachment; filename=remixed_{image_id}.png",
+            "X-Image-ID": image_id
+        }
+    )
+
+async def preprocess_upload(image_bytes: bytes, endpoint: str) -> bytes:
+    """Preprocesses an upload, answering 415 when it cannot be sent to the model."""
+    try:
+        return await image_preprocessor.process(image_bytes, endpoint)
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=str(e))
 
 @app.post("/remix-images")
 async def remix_images_endpoint(
+    request: Request,
     image1: UploadFile = File(..., description="First image for remixing"),
     image2: UploadFile = File(..., description="Second image for remixing"),
     prompt: str = Form(..., description="Prompt for image remixing"),
@@ -145,6 +210,11 @@ async def remix_images_endpoint(
     Endpoint to remix two images using Gemini AI.
 
     Receives two images and a prompt, returns the remixed image.
+
+    With `stream=true` the image is streamed as soon as the model produces it.
+    If the client also sends `Accept: text/event-stream`, the response is a
+    stream of server-sent events carrying text parts as they arrive and the
+    image (base64) when ready.
     """
     try:
         # Validate file types
@@ -153,30 +223,41 @@ async def remix_images_endpoint(
         if not image2.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="image2 must be an image file")
 
-        # Read image bytes
-        image1_bytes = await image1.read()
-        image2_bytes = await image2.read()
+        # Read image bytes and shrink them before they go to the model
+        image1_bytes, image2_bytes = await asyncio.gather(
+            preprocess_upload(await read_image_upload(image1), "remix-images"),
+            preprocess_upload(await read_image_upload(image2), "remix-images")
+        )
 
         # Generate unique image ID
         session_id = str(uuid.uuid4())[:8]  # First 8 characters of UUID
         timestamp = int(time.time())
         image_id = f"{timestamp}_{session_id}"
 
+        if stream:
+            parts = ImageRemixService().stream_remix_parts(
+                image1_bytes=image1_bytes,
+                image2_bytes=image2_bytes,
+                prompt=prompt
+            )
+            if "text/event-stream" in request.headers.get("accept", ""):
+                return StreamingResponse(
+                    remix_event_stream(parts, image_id),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Image-ID": image_id}
+                )
+            return await stream_remixed_image(parts, image_id)
+
         # Process images using the service
-        result_bytesio = remix_images_service(
+        result_bytesio = await remix_images_service_async(
             image1_bytes=image1_bytes,
             image2_bytes=image2_bytes,
-            prompt=prompt,
-            stream=stream
+            prompt=prompt
         )
 
-        # Get bytes from BytesIO for response
-        result_bytesio.seek(0)  # Ensure we're at the beginning
-        result_bytes = result_bytesio.read()
-
         # Return image as response with unique ID in filename
         return Response(
-            content=result_bytes,
+            content=result_bytesio.getvalue(),
             media_type="image/png",
             headers={
                 "Content-Disposition": f"attachment; filename=remixed_{image_id}.png",
@@ -185,11 +266,49 @@ async def remix_images_endpoint(
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
+# Cache for image description calls, keyed by image/prompt/model
+describe_cache = ResponseCache()
+
+def wants_cache_bypass(request: Request) -> bool:
+    """True when the client sent `X-Cache-Bypass: 1` or `Cache-Control: no-cache`."""
+    return (request.headers.get("x-cache-bypass", "").lower() in ("1", "true")
+            or "no-cache" in request.headers.get("cache-control", "").lower())
+
+async def describe_with_cache(image_bytes: bytes, prompt: str, model_name: str,
+                              endpoint: str, bypass: bool = False) -> Tuple[str, bool]:
+    """Describes an image, reusing the answer for byte-identical uploads. Returns (description, hit)."""
+    async def describe():
+        # cache hits skip the preprocessing too, the key is the raw upload
+        return await describe_image_service_async(
+            image_bytes=await preprocess_upload(image_bytes, endpoint),
+            prompt=prompt,
+            model_name=model_name
+        )
+
+    return await describe_cache.get_or_compute(
+        cache_key(image_bytes, prompt, model_name),
+        describe,
+        bypass=bypass
+    )
+
+async def describe_image_cached(request: Request, response: Response,
+                                image_bytes: bytes, prompt: str, model_name: str,
+                                endpoint: str) -> str:
+    """describe_with_cache for a single-image endpoint; sets `X-Cache`."""
+    description, hit = await describe_with_cache(
+        image_bytes, prompt, model_name, endpoint, bypass=wants_cache_bypass(request))
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return description
+
 @app.post("/describe-image")
 async def describe_image(
+    request: Request,
+    response: Response,
     image: UploadFile = File(..., description="Product or person image"),
     type_prompt: str = "product"
 ):
@@ -207,7 +326,7 @@ async def describe_image(
             raise HTTPException(status_code=400, detail="type_prompt must be 'product' or 'person'")
 
         # Read image bytes
-        image_bytes = await image.read()
+        image_bytes = await read_image_upload(image)
 
         # Generate unique image ID
         session_id = str(uuid.uuid4())[:8]  # First 8 characters of UUID
@@ -215,12 +334,15 @@ async def describe_image(
         image_id = f"{timestamp}_{session_id}"
 
         # Process image using the correct service
-        description = describe_image_service(
+        description = await describe_image_cached(
+            request, response,
             image_bytes=image_bytes,
             prompt={
                 "product": prompt_product,
                 "person": prompt_person
-            }.get(type_prompt, "product")
+            }.get(type_prompt, "product"),
+            model_name="gemini-2.5-flash-image-preview",
+            endpoint="describe-image"
         )
 
         # Return description as JSON response with unique ID
@@ -229,11 +351,15 @@ async def describe_image(
             "description": description
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
 @app.post("/assistant-fashion")
 async def assistant_fashion(
+    request: Request,
+    response: Response,
     image: UploadFile = File(..., description="User image with fashion items"),
 ):
     """
@@ -247,7 +373,7 @@ async def assistant_fashion(
             raise HTTPException(status_code=400, detail="File must be an image")
 
         # Read image bytes
-        image_bytes = await image.read()
+        image_bytes = await read_image_upload(image)
 
         # Generate unique image ID
         session_id = str(uuid.uuid4())[:8]  # First 8 characters of UUID
@@ -255,10 +381,12 @@ async def assistant_fashion(
         image_id = f"{timestamp}_{session_id}"
 
         # Process image using the fashion assistant service
-        description = describe_image_service(
+        description = await describe_image_cached(
+            request, response,
             image_bytes=image_bytes,
             prompt=prompt_fashion,
-            model_name="gemini-2.0-flash"
+            model_name="gemini-2.0-flash",
+            endpoint="assistant-fashion"
         )
 
         # Return description as JSON response with unique ID
@@ -267,9 +395,83 @@ async def assistant_fashion(
             "description": description
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
+async def detached_items(files: list):
+    """Batch items from detached multipart uploads, read one at a time."""
+    for filename, file in files:
+        try:
+            yield filename, await asyncio.to_thread(read_detached, file)
+        except ValueError as e:
+            yield filename, str(e)
+        finally:
+            file.close()
+
+async def archive_items(file):
+    """Batch items from a detached zip/tar upload, extracted one at a time."""
+    items = iter_archive(file, MAX_UPLOAD_BYTES)
+    while (item := await asyncio.to_thread(next, items, None)) is not None:
+        yield item
+
+@app.post("/describe-images")
+async def describe_images(
+    images: List[UploadFile] = File(None, description="Product or person images"),
+    archive: Optional[UploadFile] = File(None, description="zip or tar archive of images"),
+    type_prompt: str = "product",
+    concurrency: int = BATCH_MAX_CONCURRENCY
+):
+    """
+    Endpoint to describe many images in one request.
+
+    Receives images as multipart files and/or one zip/tar archive. Returns
+    NDJSON: one line per image (`index`, `filename`, `description` or
+    `error`) as soon as it is described, then a `summary` line. Identical
+    images are described once, and at most `concurrency` descriptions run
+    at the same time.
+    """
+    if type_prompt not in ["product", "person"]:
+        raise HTTPException(status_code=400, detail="type_prompt must be 'product' or 'person'")
+    if not images and archive is None:
+        raise HTTPException(status_code=400, detail="Send images and/or an archive")
+    if concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+
+    # the files outlive this function, the NDJSON body is produced afterwards
+    files = [(image.filename, detach_upload(image)) for image in images or []]
+    archive_file = detach_upload(archive) if archive is not None else None
+
+    async def items():
+        async for item in detached_items(files):
+            yield item
+        if archive_file is not None:
+            async for item in archive_items(archive_file):
+                yield item
+
+    prompt = prompt_product if type_prompt == "product" else prompt_person
+
+    async def describe(image_bytes: bytes) -> Tuple[str, bool]:
+        return await describe_with_cache(image_bytes, prompt,
+                                         "gemini-2.5-flash-image-preview", "describe-images")
+
+    async def body():
+        try:
+            async for line in describe_batch(items(), describe,
+                                             min(concurrency, BATCH_MAX_CONCURRENCY)):
+                yield line
+        finally:
+            for _, file in files:
+                file.close()
+            if archive_file is not None:
+                archive_file.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def read_and_preprocess(upload: UploadFile, endpoint: str) -> bytes:
+    return await preprocess_upload(await read_image_upload(upload), endpoint)
+
 @app.post("/sell-product-from-query")
 async def sell_product_from_query(
     image: UploadFile = File(..., description="User's image"),
@@ -282,49 +484,62 @@ async def sell_product_from_query(
 
     Receives a user image and text expressing product interest.
     Returns a remixed image and personalized sales description to encourage purchase.
+
+    The text classification and the upload read run concurrently and the
+    product picture comes from the in-memory image store; per-stage durations
+    are returned in `Server-Timing`.
     """
     try:
         # Validate file type
         if not image.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
 
-        # Read image bytes
-        image_bytes = await image.read()
-        
+        if not product_choice.candidates:
+            # catalog not loaded yet (or nothing in PRODUCT_CHOICE_CATEGORIES)
+            raise HTTPException(status_code=503, detail="No products available to choose from.")
+
+        timings = StageTimings()
         service = ImageSellProductService(api_key=None,
                                           model_name=model_name,
                                           text=text)
-        # print(service)
-        
-        extracted_product = service.extract_product_from_text(text)
+
+        # Stage 1: classify the text while reading the upload
+        extracted_product, image_bytes = await asyncio.gather(
+            timings.run("classify", service.extract_product_from_text_async(text)),
+            timings.run("upload", read_and_preprocess(image, "sell-product-from-query")),
+        )
         if not extracted_product or extracted_product['name'] == "None":
             raise HTTPException(status_code=400, detail="No product identified in user query.")
         product_name = extracted_product['name']
         product_id = extracted_product.get('id', None)
 
-        product = get_product_by_name(product_name)['products'][0]
-        # print(product)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product '{product_name}' not found in store.")
-
-        # print(f"Product identified: {product_name} (ID: {product['id']})")
-
-        picture_path_product = product['picture'][1:]
-
-        # Open product image using the path
+        # get() refreshes (and runs the listeners) when there is no snapshot
+        # yet, so it runs off the event loop
         try:
-            with open(picture_path_product, "rb") as f:
-                product_image_bytes = f.read()
-        # product_image_bytes will be used to mix with user's photo
+            snapshot = await timings.run("catalog", asyncio.to_thread(catalog_cache.get))
         except Exception as e:
-            raise HTTPException(status_code=404, detail=f"Product image not found: {str(e)}")
+            raise HTTPException(status_code=503, detail=f"Product catalog unavailable: {str(e)}")
+        product = snapshot.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail=f"Product '{product_name}' not found in store.")
 
-        result_bytesio = remix_images_service(
+        # product_image_bytes will be used to mix with user's photo
+        product_image_bytes = product_images.get(product['id'])
+        if product_image_bytes is None:
+            # not loaded yet (e.g. added since the last refresh)
+            try:
+                product_image_bytes = await timings.run(
+                    "picture", asyncio.to_thread(product_images.load_product, product))
+            except Exception as e:
+                raise HTTPException(status_code=404, detail=f"Product image not found: {str(e)}")
+
+        # Stage 2: remix the user's photo with the product
+        result_bytesio = await timings.run("remix", remix_images_service_async(
             image1_bytes=image_bytes,
             image2_bytes=product_image_bytes,
             prompt=f"Create a natural blend of both images. Place the product on the person in a realistic way.",
             stream=stream
-        )
+        ))
 
         result_bytesio.seek(0)  # Ensure we're at the beginning
         result_bytes = result_bytesio.read()
@@ -334,23 +549,29 @@ async def sell_product_from_query(
         timestamp = int(time.time())
         image_id = f"{timestamp}_{session_id}"
         
-        result_sell_text = service.sell_product_from_image_from_bytes(
+        # Stage 3: sales text for the remixed image
+        result_sell_text = await timings.run("sell", service.sell_product_from_image_from_bytes_async(
             image_bytes=result_bytes,
             product=product,
             prompt=prompt_sell_product
-        )
+        ))
         
         # Encode remixed image in base64 for easy JSON return
         image_base64 = base64.b64encode(result_bytes).decode("utf-8")
 
-        return {
-            "image_id": image_id,
-            "image_base64": image_base64,
-            "sell_text": result_sell_text,
-            "product_id": product_id,
-            "product_name": product_name
-        }
+        return JSONResponse(
+            content={
+                "image_id": image_id,
+                "image_base64": image_base64,
+                "sell_text": result_sell_text,
+                "product_id": product_id,
+                "product_name": product_name
+            },
+            headers={"Server-Timing": timings.header()}
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
@@ -466,3 +687,21 @@ def send_order_confirmation(
 def health_check():
     """Health check endpoint to verify service status."""
     return {"status": "healthy"}
+
+@app.get("/stats")
+def get_stats():
+    """Runtime counters (gRPC pools, catalog, Gemini clients, model queues, response cache)."""
+    return {
+        "catalog": catalog_cache.stats(),
+        "product_images": product_images.stats(),
+        "product_choice": product_choice.stats(),
+        "genai": client_registry.stats(),
+        "models": model_limiter.stats(),
+        "describe_cache": describe_cache.stats(),
+        "image_preprocess": image_preprocessor.stats(),
+        "grpc": {
+            "productcatalog": catalog_pool.stats(),
+            "cart": cart_pool.stats(),
+            "email": email_pool.stats()
+        }
+    }
@@ -0,0 +1,109 @@
+"""
+Throughput of /describe-images at several concurrency levels, compared to
+looping over /describe-image, against the local fake Gemini server.
+
+The service and the fake server run on local uvicorn servers. The batch
+holds IMAGES distinct images plus DUPLICATES repeated ones. The describe
+cache is reset before every run and image preprocessing is off, so the
+numbers reflect the model calls. Run from src/nanobananaservice:
+
+    python -m benchmarks.batch_describe
+"""
+import asyncio
+import io
+import json
+import os
+import time
+import zipfile
+
+from PIL import Image
+
+from benchmarks.fake_gemini_server import BackgroundServer, FakeGeminiServer
+from src.fake_genai import FakeGenAIBackend
+
+IMAGES = 96
+DUPLICATES = 32
+LATENCY_MS = 300
+CONCURRENCY = [1, 4, 8, 16, 32]
+PORT = 8097
+SERVICE_PORT = 8098
+
+os.environ.update({
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{PORT}",
+    "BATCH_MAX_CONCURRENCY": str(max(CONCURRENCY)),
+    "GENAI_MAX_CONCURRENCY": str(max(CONCURRENCY)),
+    "IMAGE_PREPROCESS": "0",
+})
+
+import httpx  # noqa: E402
+
+import app as service  # noqa: E402
+from src.response_cache import ResponseCache  # noqa: E402
+
+
+def make_images():
+    images = []
+    for i in range(IMAGES):
+        out = io.BytesIO()
+        Image.new("RGB", (64, 64), (i * 2 % 256, i * 5 % 256, i * 7 % 256)).save(out, format="JPEG")
+        images.append((f"product-{i}.jpg", out.getvalue()))
+    images += [(f"copy-{i}.jpg", images[i][1]) for i in range(DUPLICATES)]
+    return images
+
+
+def make_zip(images) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        for name, data in images:
+            archive.writestr(name, data)
+    return out.getvalue()
+
+
+async def run_batch(client, files, concurrency, fake):
+    service.describe_cache = ResponseCache()
+    calls = fake.requests
+    start = time.perf_counter()
+    first = None
+    lines = []
+    async with client.stream("POST", "/describe-images", files=files,
+                             params={"concurrency": concurrency}) as response:
+        async for line in response.aiter_lines():
+            if first is None:
+                first = time.perf_counter() - start
+            lines.append(json.loads(line))
+    return time.perf_counter() - start, first, fake.requests - calls
+
+
+async def run_loop(client, images):
+    service.describe_cache = ResponseCache()
+    start = time.perf_counter()
+    for name, data in images:
+        response = await client.post("/describe-image", files={"image": (name, data, "image/jpeg")})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def main(fake):
+    images = make_images()
+    multipart = [("images", (name, data, "image/jpeg")) for name, data in images]
+    archive = [("archive", ("images.zip", make_zip(images), "application/zip"))]
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVICE_PORT}", timeout=None) as client:
+        print(f"{len(images)} images ({IMAGES} unique), fake model latency {LATENCY_MS} ms")
+        elapsed = await run_loop(client, images)
+        print(f"{'loop /describe-image':<28} {elapsed:7.2f} s  {len(images) / elapsed:7.1f} img/s")
+        for concurrency in CONCURRENCY:
+            elapsed, first, calls = await run_batch(client, multipart, concurrency, fake)
+            print(f"{f'batch multipart c={concurrency}':<28} {elapsed:7.2f} s  "
+                  f"{len(images) / elapsed:7.1f} img/s  first line {first * 1000:6.0f} ms  "
+                  f"model calls {calls}")
+        elapsed, first, calls = await run_batch(client, archive, 16, fake)
+        print(f"{'batch zip c=16':<28} {elapsed:7.2f} s  {len(images) / elapsed:7.1f} img/s  "
+              f"first line {first * 1000:6.0f} ms  model calls {calls}")
+
+
+if __name__ == "__main__":
+    backend = FakeGenAIBackend(latency_ms=LATENCY_MS, distribution="fixed")
+    with FakeGeminiServer(PORT, backend) as fake, BackgroundServer(service.app, SERVICE_PORT):
+        asyncio.run(main(fake))
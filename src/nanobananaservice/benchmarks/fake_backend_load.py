@@ -0,0 +1,90 @@
+"""
+Concurrent load on the AI endpoints with the in-process fake Gemini backend
+(GENAI_BACKEND=fake): per-endpoint latency percentiles and event-loop lag.
+
+A high loop lag means something blocks the event loop; compare runs while
+changing GENAI_MAX_CONCURRENCY, IMAGE_PREPROCESS_WORKERS or the FAKE_GENAI_*
+settings. Run from src/nanobananaservice:
+
+    python -m benchmarks.fake_backend_load
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GENAI_BACKEND", "fake")
+os.environ.setdefault("FAKE_GENAI_SEED", "42")
+os.environ.setdefault("FAKE_GENAI_LATENCY_MS", "200")
+
+import httpx  # noqa: E402
+
+import app as service  # noqa: E402
+
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), "..", "images")
+USERS = 32
+REQUESTS_PER_USER = 8
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def probe_loop(stop: asyncio.Event, lags: list):
+    """Measures how late a 10 ms timer fires."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def user(client, images, latencies):
+    for i in range(REQUESTS_PER_USER):
+        name, data = images[i % len(images)]
+        if i % 2:
+            endpoint = "/remix-images"
+            files = {"image1": (name, data, "image/png"), "image2": (name, data, "image/png")}
+            form = {"prompt": "Place the product on the person."}
+            headers = {}
+        else:
+            endpoint = "/describe-image"
+            files = {"image": (name, data, "image/png")}
+            form = {}
+            headers = {"X-Cache-Bypass": "1"}
+        start = time.perf_counter()
+        response = await client.post(endpoint, files=files, data=form, headers=headers)
+        latencies.setdefault(f"{endpoint} {response.status_code}", []).append(
+            (time.perf_counter() - start) * 1000)
+
+
+async def main():
+    images = []
+    for name in sorted(os.listdir(IMAGES_DIR)):
+        with open(os.path.join(IMAGES_DIR, name), "rb") as f:
+            images.append((name, f.read()))
+
+    latencies, lags = {}, []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        probe = asyncio.create_task(probe_loop(stop, lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(user(client, images, latencies) for _ in range(USERS)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{USERS} users x {REQUESTS_PER_USER} requests in {elapsed:.2f} s ({total / elapsed:.1f} req/s)")
+    for name, values in sorted(latencies.items()):
+        print(f"{name:<24} n={len(values):<4} p50={percentile(values, 50):7.1f} ms  "
+              f"p95={percentile(values, 95):7.1f} ms  p99={percentile(values, 99):7.1f} ms")
+    print(f"event loop lag: mean={statistics.mean(lags):.1f} ms  p99={percentile(lags, 99):.1f} ms  "
+          f"max={max(lags):.1f} ms")
+    print(service.client_registry.stats()["fake"])
+    service.image_preprocessor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Local stand-in for the Gemini REST API (generateContent and
+streamGenerateContent), answering from FakeGenAIBackend: canned text or
+images, configurable latency distribution, error rate and stream chunking
+(see the FAKE_GENAI_* variables in src/fake_genai.py).
+
+Point the service at it with GEMINI_BASE_URL=http://127.0.0.1:8090 and
+any GEMINI_API_KEY. Run from src/nanobananaservice:
+
+    python -m benchmarks.fake_gemini_server --port 8090 --latency-ms 300
+"""
+import argparse
+import json
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.genai import errors, types
+
+from src.fake_genai import FakeGenAIBackend
+
+
+def _dump(response: types.GenerateContentResponse) -> dict:
+    return response.model_dump(mode="json", by_alias=True, exclude_none=True,
+                               exclude={"parsed", "automatic_function_calling_history"})
+
+
+def _error_response(e: errors.APIError) -> JSONResponse:
+    return JSONResponse(status_code=e.code, content={"error": {"code": e.code, "status": e.status,
+                                                               "message": e.message}})
+
+
+def build_app(backend: Optional[FakeGenAIBackend] = None) -> FastAPI:
+    backend = backend or FakeGenAIBackend()
+    app = FastAPI()
+    app.state.backend = backend
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate_content(version: str, model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        if action not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"{action} is not faked")
+        body = await request.json()
+        # JSON validation decodes the base64 inline data
+        contents = [types.Content.model_validate_json(json.dumps(content))
+                    for content in body.get("contents", [])]
+        config = body.get("generationConfig", {})
+        config = {"response_modalities": config.get("responseModalities"),
+                  "response_schema": config.get("responseSchema")}
+
+        if action == "generateContent":
+            try:
+                response = await backend.generate_async(model, contents, config)
+            except errors.APIError as e:
+                return _error_response(e)
+            return _dump(response)
+
+        async def events():
+            try:
+                async for chunk in backend.generate_stream_async(model, contents, config):
+                    yield f"data: {json.dumps(_dump(chunk))}\r\n\r\n"
+            except errors.APIError as e:
+                yield f"data: {json.dumps({'error': {'code': e.code, 'status': e.status, 'message': e.message}})}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class BackgroundServer:
+    """Serves an ASGI app with uvicorn on a background thread (for benchmarks)."""
+
+    def __init__(self, app, port: int, lifespan: str = "off"):
+        self.app = app
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port,
+                                                     log_level="warning", lifespan=lifespan))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+class FakeGeminiServer(BackgroundServer):
+    def __init__(self, port: int = 8090, backend: Optional[FakeGenAIBackend] = None):
+        super().__init__(build_app(backend), port)
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.backend.requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=None, help="median latency")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=None)
+    args = parser.parse_args()
+    backend = FakeGenAIBackend(latency_ms=args.latency_ms, distribution=args.distribution,
+                               error_rate=args.error_rate)
+    uvicorn.run(build_app(backend), host="127.0.0.1", port=args.port)
@@ -0,0 +1,101 @@
+"""
+End-to-end latency of the AI endpoints with image preprocessing on and off,
+for camera-sized photos, against the local fake Gemini server.
+
+The service and the fake server run on local uvicorn servers (lifespan on,
+so the preprocessing pool is started as in production). Both are on
+localhost, so the time it takes to upload the bytes to Gemini is close to
+zero here; the request size printed next to each endpoint is what a real
+uplink would carry. Run from src/nanobananaservice:
+
+    python -m benchmarks.preprocess_latency
+"""
+import asyncio
+import io
+import os
+import random
+import time
+
+from PIL import Image
+
+from benchmarks.fake_gemini_server import BackgroundServer, FakeGeminiServer
+from src.fake_genai import FakeGenAIBackend
+
+LATENCY_MS = 300
+REQUESTS = 12
+CONCURRENCY = [1, 8]
+PORT = 8095
+SERVICE_PORT = 8096
+
+os.environ.update({
+    # the real client, so the image bytes go over HTTP to the fake server
+    "GENAI_BACKEND": "gemini",
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_BASE_URL": f"http://127.0.0.1:{PORT}",
+})
+
+import httpx  # noqa: E402
+
+import app as service  # noqa: E402
+from benchmarks.fake_backend_load import percentile  # noqa: E402
+
+
+def make_photo(seed: int) -> bytes:
+    """A 4000x3000 JPEG with noise, about the size of a phone photo."""
+    rng = random.Random(seed)
+    small = Image.new("RGB", (400, 300))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(400 * 300)])
+    out = io.BytesIO()
+    small.resize((4000, 3000), Image.Resampling.BICUBIC).save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+async def call(client, endpoint, photo):
+    start = time.perf_counter()
+    if endpoint == "/describe-image":
+        response = await client.post(endpoint, files={"image": ("photo.jpg", photo, "image/jpeg")},
+                                     headers={"X-Cache-Bypass": "1"})
+    else:
+        response = await client.post(endpoint, data={"prompt": "Place the product on the person."},
+                                     files={"image1": ("a.jpg", photo, "image/jpeg"),
+                                            "image2": ("b.jpg", photo, "image/jpeg")})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(client, endpoint, photos, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(photo):
+        async with slots:
+            return await call(client, endpoint, photo)
+
+    return await asyncio.gather(*(one(photos[i % len(photos)]) for i in range(REQUESTS)))
+
+
+async def main():
+    photos = [make_photo(seed) for seed in range(4)]
+    size = sum(len(p) for p in photos) // len(photos)
+    print(f"{REQUESTS} requests per row, 4000x3000 JPEG photos ({size // 1024} KB), "
+          f"fake model latency {LATENCY_MS} ms, {service.image_preprocessor.workers} preprocessing workers")
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVICE_PORT}", timeout=None) as client:
+        for endpoint in ("/describe-image", "/remix-images"):
+            for concurrency in CONCURRENCY:
+                row = []
+                for enabled in (False, True):
+                    service.image_preprocessor.enabled = enabled
+                    latencies = await run(client, endpoint, photos, concurrency)
+                    row.append(f"{'on ' if enabled else 'off'} p50={percentile(latencies, 50):6.0f} ms "
+                               f"p95={percentile(latencies, 95):6.0f} ms")
+                print(f"{endpoint:<16} c={concurrency:<2} " + "  |  ".join(row))
+    stats = service.image_preprocessor.stats()
+    for endpoint, s in stats.items():
+        print(f"{endpoint:<16} sent to Gemini per image: {s['bytes_in'] // s['images'] // 1024} KB -> "
+              f"{s['bytes_out'] // s['images'] // 1024} KB, preprocessing {s['avg_preprocess_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    backend = FakeGenAIBackend(latency_ms=LATENCY_MS, distribution="fixed")
+    with FakeGeminiServer(PORT, backend):
+        with BackgroundServer(service.app, SERVICE_PORT, lifespan="on"):
+            asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Local product choice tier over a labeled PT/EN query set: how many queries
+it answers, how many of those are right, and how long it takes. Queries it
+does not answer would go to the LLM.
+
+Uses the catalog in src/productcatalogservice/products.json and the same
+candidate products (wearable categories) as the service. Run from
+src/nanobananaservice:
+
+    python -m benchmarks.product_choice
+"""
+import json
+import os
+import time
+
+from src.catalog_cache import CatalogSnapshot
+from src.product_classifier import ProductClassifier, TieredProductChoice
+
+CATALOG = os.path.join(os.path.dirname(__file__), "..", "..", "productcatalogservice", "products.json")
+
+# (query, expected product name, or None when there is no product to sell)
+QUERIES = [
+    ("Gostei muito desses óculos de sol, posso experimentar?", "Sunglasses"),
+    ("quero ver como fico com óculos escuros", "Sunglasses"),
+    ("I really like sunglasses, can you help me?", "Sunglasses"),
+    ("show me with some shades on", "Sunglasses"),
+    ("Quero um óculos para a praia", "Sunglasses"),
+    ("Adorei essa regata!", "Tank Top"),
+    ("como fica essa camiseta em mim?", "Tank Top"),
+    ("I want to try the tank top", "Tank Top"),
+    ("can I see myself in that top?", "Tank Top"),
+    ("quero uma blusa nova", "Tank Top"),
+    ("Quero experimentar o relógio", "Watch"),
+    ("esse relogio combina comigo?", "Watch"),
+    ("I'd love a new watch", "Watch"),
+    ("put the wristwatch on me", "Watch"),
+    ("quero um relógio de pulso elegante", "Watch"),
+    ("Gostei dos mocassins", "Loafers"),
+    ("quero ver esses sapatos no meu pé", "Loafers"),
+    ("I need new shoes for work", "Loafers"),
+    ("try the loafers on me please", "Loafers"),
+    ("um mocassim marrom ficaria bom?", "Loafers"),
+    ("Não quero óculos, quero um relógio", "Watch"),
+    ("I don't want the tank top, show me the loafers", "Loafers"),
+    ("quero algum acessório", None),
+    ("me mostra uma roupa legal", "Tank Top"),
+    ("quero óculos e relógio", None),
+    ("Olá, tudo bem?", None),
+    ("what's the weather like?", None),
+    ("não quero nada", None),
+    ("quero um chapéu", None),
+    ("I like the mug", None),
+]
+
+ITERATIONS = 2000
+
+
+def main():
+    with open(CATALOG, "r", encoding="utf-8") as f:
+        products = json.load(f)["products"]
+    tiers = TieredProductChoice()
+    tiers.load(CatalogSnapshot(1, products))
+
+    build_start = time.perf_counter()
+    classifier = ProductClassifier(tiers.candidates)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    answered = correct = 0
+    for query, expected in QUERIES:
+        product = tiers.classify_local(query)
+        _, confidence = classifier.classify(query)
+        if product is None:
+            verdict = "llm"
+        else:
+            answered += 1
+            correct += product["name"] == expected
+            verdict = "ok" if product["name"] == expected else "WRONG"
+        print(f"{verdict:>5}  {confidence:4.2f}  {query!r} -> "
+              f"{product['name'] if product else '-'} (expected {expected})")
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for query, _ in QUERIES:
+            classifier.classify(query)
+    per_query_us = (time.perf_counter() - start) / (ITERATIONS * len(QUERIES)) * 1e6
+
+    print()
+    print(f"vocabulary: {len(classifier.terms)} terms, built in {build_ms:.2f} ms")
+    print(f"answered locally: {answered}/{len(QUERIES)} ({answered / len(QUERIES):.0%}), "
+          f"correct: {correct}/{answered}")
+    print(f"local classification: {per_query_us:.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Peak RSS per request for image uploads: plain `await image.read()` versus
+`read_upload` behind BodySizeLimitMiddleware.
+
+Each measurement runs in a fresh interpreter so ru_maxrss only reflects
+that single request. Run from src/nanobananaservice:
+
+    python -m benchmarks.upload_memory
+"""
+import asyncio
+import base64
+import os
+import resource
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from src.uploads import BodySizeLimitMiddleware, read_upload
+
+SIZES_MB = [1, 10, 20, 64]
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+    if variant == "bounded":
+        app.add_middleware(BodySizeLimitMiddleware)
+
+    @app.post("/upload")
+    async def upload(image: UploadFile = File(...)):
+        if variant == "bounded":
+            data = await read_upload(image)
+        else:
+            data = await image.read()
+        # the JSON endpoints return the image base64 encoded
+        encoded = base64.b64encode(data).decode("utf-8")
+        return {"size": len(data), "encoded": len(encoded)}
+
+    return app
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def one_request(variant: str, size_mb: int) -> None:
+    payload = os.urandom(size_mb * 1024 * 1024)
+    transport = httpx.ASGITransport(app=build_app(variant))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before = peak_rss_mb()
+        response = await client.post("/upload", files={"image": ("photo.jpg", payload, "image/jpeg")})
+        after = peak_rss_mb()
+    print(f"{response.status_code} {after - before:.1f}")
+
+
+def main() -> None:
+    print(f"{'size MB':>8} {'variant':>8} {'status':>6} {'peak RSS +MB':>13}")
+    for size_mb in SIZES_MB:
+        for variant in ("legacy", "bounded"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload_memory", variant, str(size_mb)],
+                capture_output=True, text=True, check=True).stdout.split()
+            print(f"{size_mb:>8} {variant:>8} {out[0]:>6} {float(out[1]):>13.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        asyncio.run(one_request(sys.argv[1], int(sys.argv[2])))
+    else:
+        main()
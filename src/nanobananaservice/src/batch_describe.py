@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import os
+import posixpath
+import tarfile
+import time
+import zipfile
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Tuple, Union
+
+from src.mime import sniff_mime_type
+
+# Upper bound for the per-request concurrency a client can ask for
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "1000"))
+
+# (filename, image bytes or an error message)
+BatchItem = Tuple[str, Union[bytes, str]]
+
+
+def _skipped(name: str) -> bool:
+    """Hidden files and macOS resource forks that come along in archives."""
+    return name.startswith("__MACOSX/") or posixpath.basename(name).startswith(".")
+
+
+def iter_archive(fileobj: BinaryIO, max_member_bytes: int) -> Iterator[BatchItem]:
+    """
+    Yields the regular files of a zip or tar (optionally gzip/bz2/xz) archive.
+
+    Tar archives are read as a stream; members larger than `max_member_bytes`
+    are reported as errors without being read. Raises ValueError for
+    anything else.
+    """
+    fileobj.seek(0)
+    if fileobj.read(4) == b"PK\x03\x04":
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skipped(info.filename):
+                    continue
+                if info.file_size > max_member_bytes:
+                    yield info.filename, f"exceeds the {max_member_bytes} bytes limit"
+                    continue
+                with archive.open(info) as f:
+                    data = f.read(max_member_bytes + 1)
+                if len(data) > max_member_bytes:
+                    yield info.filename, f"exceeds the {max_member_bytes} bytes limit"
+                    continue
+                yield info.filename, data
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise ValueError("Archive must be a zip or tar file")
+    with archive:
+        for member in archive:
+            if not member.isfile() or _skipped(member.name):
+                continue
+            if member.size > max_member_bytes:
+                yield member.name, f"exceeds the {max_member_bytes} bytes limit"
+                continue
+            yield member.name, archive.extractfile(member).read()
+
+
+def _line(content: dict) -> bytes:
+    return json.dumps(content, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+async def describe_batch(items: AsyncIterator[BatchItem],
+                         describe: Callable[[bytes], Awaitable[Tuple[str, bool]]],
+                         concurrency: int) -> AsyncIterator[bytes]:
+    """
+    Describes a stream of images and yields one NDJSON line per image as
+    soon as its description is ready, then a summary line.
+
+    At most `concurrency` descriptions run at once, and the next image is
+    not read until a slot is free. Identical images are described once;
+    every copy gets its own line, flagged as a duplicate.
+    """
+    started = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(concurrency)
+    waiting: Dict[str, List[Tuple[int, str]]] = {}
+    results: Dict[str, dict] = {}
+    tasks = set()
+    counts = {"images": 0, "unique": 0, "duplicates": 0, "errors": 0}
+
+    def emit(index: int, filename: str, result: dict, duplicate: bool = False) -> None:
+        if "error" in result:
+            counts["errors"] += 1
+        line = {"index": index, "filename": filename, **result}
+        if "error" not in result:
+            line["duplicate"] = duplicate
+        queue.put_nowait(_line(line))
+
+    async def run(digest: str, data: bytes) -> None:
+        try:
+            description, cached = await describe(data)
+            result = {"sha256": digest, "description": description, "cached": cached}
+        except Exception as e:
+            result = {"sha256": digest, "error": str(getattr(e, "detail", e))}
+        finally:
+            slots.release()
+        results[digest] = result
+        for i, (index, filename) in enumerate(waiting.pop(digest)):
+            emit(index, filename, result, duplicate=i > 0)
+
+    async def produce() -> None:
+        try:
+            index = 0
+            async for filename, data in items:
+                if index >= BATCH_MAX_IMAGES:
+                    emit(index, filename, {"error": f"batch exceeds {BATCH_MAX_IMAGES} images"})
+                    break
+                counts["images"] += 1
+                if isinstance(data, str):
+                    emit(index, filename, {"error": data})
+                elif sniff_mime_type(data) is None:
+                    emit(index, filename, {"error": "not a supported image format"})
+                else:
+                    digest = hashlib.sha256(data).hexdigest()
+                    if digest in results:
+                        counts["duplicates"] += 1
+                        emit(index, filename, results[digest], duplicate=True)
+                    elif digest in waiting:
+                        counts["duplicates"] += 1
+                        waiting[digest].append((index, filename))
+                    else:
+                        counts["unique"] += 1
+                        waiting[digest] = [(index, filename)]
+                        await slots.acquire()
+                        task = asyncio.create_task(run(digest, data))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                index += 1
+            while tasks:
+                await asyncio.gather(*list(tasks))
+        except Exception as e:
+            counts["errors"] += 1
+            queue.put_nowait(_line({"error": str(e)}))
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (line := await queue.get()) is not None:
+            yield line
+        yield _line({"summary": {**counts,
+                                 "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}})
+    finally:
+        # the client went away or we are done: stop reading and describing
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import demo_pb2
+
+
+def product_to_dict(product) -> dict:
+    """Converts a demo_pb2.Product into the JSON shape used by the HTTP API."""
+    return {
+        "id": str(product.id),
+        "name": str(product.name),
+        "description": str(product.description),
+        "price": str(product.price_usd.units),
+        "picture": str(product.picture),
+        "categories": [str(category) for category in product.categories]
+    }
+
+
+def dump_json(content) -> bytes:
+    """Serializes like FastAPI's JSONResponse does."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks an If-None-Match header value against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CatalogSnapshot:
+    """Immutable catalog view with pre-serialized JSON and lookup indexes."""
+
+    def __init__(self, version: int, products: List[dict], list_json: Optional[bytes] = None):
+        self.version = version
+        self.fetched_at = time.time()
+        self.products = products
+        self.by_id: Dict[str, dict] = {}
+        self.by_name: Dict[str, List[dict]] = {}
+        self.by_category: Dict[str, List[dict]] = {}
+        for product in products:
+            self.by_id[product["id"]] = product
+            self.by_name.setdefault(product["name"].casefold(), []).append(product)
+            for category in product["categories"]:
+                self.by_category.setdefault(category.casefold(), []).append(product)
+
+        self.list_json = list_json or dump_json({"products": products})
+        self.etag = make_etag(self.list_json)
+
+    def get(self, product_id: str) -> Optional[dict]:
+        return self.by_id.get(product_id)
+
+    def find_by_name(self, name: str) -> List[dict]:
+        return self.by_name.get(name.casefold(), [])
+
+    def find_by_category(self, category: str) -> List[dict]:
+        return self.by_category.get(category.casefold(), [])
+
+
+class CatalogCache:
+    """
+    In-process copy of the product catalog, refreshed in the background.
+
+    Requests read the current snapshot without calling ProductCatalogService.
+    If a refresh fails the previous snapshot keeps being served. The refresh
+    interval comes from CATALOG_REFRESH_INTERVAL (seconds, default 60).
+    Listeners added with add_listener are called with every new snapshot.
+    """
+
+    def __init__(self, stub, refresh_interval: Optional[float] = None):
+        self._stub = stub
+        self.refresh_interval = refresh_interval or float(os.getenv("CATALOG_REFRESH_INTERVAL", "60"))
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_ms = 0.0
+
+    def add_listener(self, listener: Callable[[CatalogSnapshot], None]) -> None:
+        """Registers a callback run (on the refreshing thread) when the catalog changes."""
+        self._listeners.append(listener)
+
+    def get(self) -> CatalogSnapshot:
+        """
+        Returns the current snapshot; only blocks on the catalog if there is
+        none yet. Async code calls it with asyncio.to_thread.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return self.refresh()
+
+    def refresh(self) -> CatalogSnapshot:
+        start = time.perf_counter()
+        try:
+            response = self._stub.ListProducts(demo_pb2.Empty())
+        except Exception:
+            self.refresh_errors += 1
+            if self._snapshot is None:
+                raise
+            return self._snapshot
+        products = [product_to_dict(product) for product in response.products]
+        list_json = dump_json({"products": products})
+        changed = False
+        with self._lock:
+            snapshot = self._snapshot
+            # keep the same version (and ETag) while the catalog is unchanged
+            if snapshot is None or list_json != snapshot.list_json:
+                version = (snapshot.version + 1) if snapshot else 1
+                snapshot = CatalogSnapshot(version, products, list_json)
+                self._snapshot = snapshot
+                changed = True
+            self.refreshes += 1
+            self.last_refresh_ms = (time.perf_counter() - start) * 1000
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    print(f"Catalog listener failed: {e}")
+        return snapshot
+
+    def start(self) -> None:
+        """Loads the catalog once and starts the background refresh thread."""
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Initial catalog load failed: {e}")
+        self._thread = threading.Thread(target=self._run, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Catalog refresh failed: {e}")
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else 0,
+            "products": len(snapshot.products) if snapshot else 0,
+            "etag": snapshot.etag if snapshot else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_ms": round(self.last_refresh_ms, 3),
+        }
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import typing
+from enum import Enum
+from io import BytesIO
+from typing import AsyncIterator, Iterator, List, Optional
+
+from google.genai import errors, types
+from PIL import Image
+from pydantic import BaseModel
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def _placeholder_png() -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (256, 256), (255, 214, 0)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _config_value(config, name: str):
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(name)
+    return getattr(config, name, None)
+
+
+def _fake_value(annotation, text: str):
+    """A deterministic value of a response_schema (a Python type, or a JSON schema dict over REST)."""
+    if isinstance(annotation, dict):
+        kind = str(annotation.get("type", "STRING")).upper()
+        if annotation.get("enum"):
+            return annotation["enum"][0]
+        if kind == "ARRAY":
+            return [_fake_value(annotation.get("items", {}), text)]
+        if kind == "OBJECT":
+            return {name: _fake_value(schema, text)
+                    for name, schema in annotation.get("properties", {}).items()}
+        if kind in ("NUMBER", "INTEGER"):
+            return 0
+        if kind == "BOOLEAN":
+            return False
+        return text
+    origin = typing.get_origin(annotation)
+    if origin in (list, List):
+        return [_fake_value(typing.get_args(annotation)[0], text)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {name: _fake_value(field.annotation, text)
+                for name, field in annotation.model_fields.items()}
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return next(iter(annotation)).value
+    if annotation in (int, float):
+        return 0
+    if annotation is bool:
+        return False
+    return text
+
+
+class FakeGenAIBackend:
+    """
+    Local stand-in for the Gemini API with canned answers.
+
+    Text requests get FAKE_GENAI_TEXT; JSON schema requests get a value of
+    the schema; image requests also get an image (FAKE_GENAI_IMAGE, or the
+    first image of the request). Every call waits for a latency drawn from
+    FAKE_GENAI_LATENCY_DIST (fixed, uniform, exponential or lognormal, default
+    lognormal) around FAKE_GENAI_LATENCY_MS (median, default 300) with spread
+    FAKE_GENAI_LATENCY_SIGMA (default 0.5), and fails with a 503 at
+    FAKE_GENAI_ERROR_RATE. Streams are split into FAKE_GENAI_STREAM_CHUNKS
+    chunks. FAKE_GENAI_SEED makes the draws reproducible.
+    """
+
+    def __init__(self,
+                 latency_ms: Optional[float] = None,
+                 distribution: Optional[str] = None,
+                 sigma: Optional[float] = None,
+                 error_rate: Optional[float] = None,
+                 stream_chunks: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_GENAI_LATENCY_MS", "300"))
+        self.distribution = distribution or os.getenv("FAKE_GENAI_LATENCY_DIST", "lognormal")
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"FAKE_GENAI_LATENCY_DIST must be one of {', '.join(DISTRIBUTIONS)}")
+        self.sigma = sigma if sigma is not None else float(os.getenv("FAKE_GENAI_LATENCY_SIGMA", "0.5"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_GENAI_ERROR_RATE", "0"))
+        self.stream_chunks = max(1, stream_chunks or int(os.getenv("FAKE_GENAI_STREAM_CHUNKS", "4")))
+        seed = seed if seed is not None else os.getenv("FAKE_GENAI_SEED")
+        self._random = random.Random(int(seed)) if seed is not None else random.Random()
+        self.text = os.getenv("FAKE_GENAI_TEXT", "")
+        image_path = os.getenv("FAKE_GENAI_IMAGE")
+        self.image: Optional[bytes] = None
+        if image_path:
+            with open(image_path, "rb") as f:
+                self.image = f.read()
+        self._placeholder: Optional[bytes] = None
+        self.requests = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+
+    def sample_latency(self) -> float:
+        """Latency of one call in seconds."""
+        median = self.latency_ms / 1000
+        if self.distribution == "uniform":
+            return self._random.uniform(0, 2 * median)
+        if self.distribution == "exponential":
+            # exponential with this median
+            return self._random.expovariate(math.log(2) / median) if median else 0.0
+        if self.distribution == "lognormal":
+            return median * math.exp(self._random.gauss(0, self.sigma))
+        return median
+
+    def _fails(self) -> bool:
+        return self._random.random() < self.error_rate
+
+    def _error(self) -> errors.APIError:
+        self.errors += 1
+        return errors.ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE",
+                                                  "message": "Fake backend error"}})
+
+    def _answer_image(self, contents) -> bytes:
+        if self.image is not None:
+            return self.image
+        for content in contents or []:
+            for part in getattr(content, "parts", None) or [content]:
+                blob = getattr(part, "inline_data", None)
+                if blob is not None and blob.data:
+                    return blob.data
+        if self._placeholder is None:
+            self._placeholder = _placeholder_png()
+        return self._placeholder
+
+    def _answer(self, model: str, contents, config) -> List[types.Part]:
+        text = self.text or f"Fake response from {model}."
+        schema = _config_value(config, "response_schema")
+        if schema is not None:
+            text = json.dumps(_fake_value(schema, text))
+        parts = [types.Part.from_text(text=text)]
+        if "IMAGE" in (_config_value(config, "response_modalities") or []):
+            parts.append(types.Part(inline_data=types.Blob(data=self._answer_image(contents),
+                                                           mime_type="image/png")))
+        return parts
+
+    def _response(self, model: str, parts: List[types.Part], config=None) -> types.GenerateContentResponse:
+        response = types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts),
+                                        finish_reason=types.FinishReason.STOP)],
+            model_version=model,
+        )
+        schema = _config_value(config, "response_schema")
+        if schema is not None and parts and parts[0].text:
+            response.parsed = _parse(schema, parts[0].text)
+        return response
+
+    def _chunks(self, model: str, parts: List[types.Part]) -> List[types.GenerateContentResponse]:
+        """Splits the text over the chunks; other parts come with the last one."""
+        text = "".join(part.text for part in parts if part.text)
+        others = [part for part in parts if not part.text]
+        size = math.ceil(len(text) / self.stream_chunks) or 1
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        pieces += [""] * (self.stream_chunks - len(pieces))
+        chunks = []
+        for i, piece in enumerate(pieces):
+            chunk_parts = [types.Part.from_text(text=piece)] if piece else []
+            if i == len(pieces) - 1:
+                chunk_parts += others
+            chunks.append(self._response(model, chunk_parts))
+        return chunks
+
+    def generate(self, model: str, contents, config=None) -> types.GenerateContentResponse:
+        delay = self._start()
+        time.sleep(delay)
+        if self._fails():
+            raise self._error()
+        return self._response(model, self._answer(model, contents, config), config)
+
+    async def generate_async(self, model: str, contents, config=None) -> types.GenerateContentResponse:
+        delay = self._start()
+        await asyncio.sleep(delay)
+        if self._fails():
+            raise self._error()
+        return self._response(model, self._answer(model, contents, config), config)
+
+    def generate_stream(self, model: str, contents, config=None) -> Iterator[types.GenerateContentResponse]:
+        delay = self._start()
+        fails = self._fails()
+        for chunk in self._chunks(model, self._answer(model, contents, config)):
+            time.sleep(delay / self.stream_chunks)
+            if fails:
+                raise self._error()
+            yield chunk
+
+    async def generate_stream_async(self, model: str, contents,
+                                    config=None) -> AsyncIterator[types.GenerateContentResponse]:
+        delay = self._start()
+        fails = self._fails()
+        for chunk in self._chunks(model, self._answer(model, contents, config)):
+            await asyncio.sleep(delay / self.stream_chunks)
+            if fails:
+                raise self._error()
+            yield chunk
+
+    def _start(self) -> float:
+        self.requests += 1
+        delay = self.sample_latency()
+        self.total_latency_ms += delay * 1000
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency_ms / self.requests, 3) if self.requests else 0.0,
+            "distribution": self.distribution,
+        }
+
+
+def _parse(schema, text: str):
+    value = json.loads(text)
+    if typing.get_origin(schema) in (list, List):
+        item = typing.get_args(schema)[0]
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return [item.model_validate(v) for v in value]
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema.model_validate(value)
+    return value
+
+
+class _FakeModels:
+    def __init__(self, backend: FakeGenAIBackend):
+        self._backend = backend
+
+    def generate_content(self, *, model: str, contents, config=None):
+        return self._backend.generate(model, contents, config)
+
+    def generate_content_stream(self, *, model: str, contents, config=None):
+        return self._backend.generate_stream(model, contents, config)
+
+
+class _FakeAsyncModels:
+    def __init__(self, backend: FakeGenAIBackend):
+        self._backend = backend
+
+    async def generate_content(self, *, model: str, contents, config=None):
+        return await self._backend.generate_async(model, contents, config)
+
+    async def generate_content_stream(self, *, model: str, contents, config=None):
+        # like the SDK: awaiting returns the async iterator of chunks
+        return self._backend.generate_stream_async(model, contents, config)
+
+
+class _FakeAio:
+    def __init__(self, backend: FakeGenAIBackend):
+        self.models = _FakeAsyncModels(backend)
+
+
+class FakeClient:
+    """Drop-in for the parts of genai.Client the services use."""
+
+    def __init__(self, backend: FakeGenAIBackend):
+        self.models = _FakeModels(backend)
+        self.aio = _FakeAio(backend)
@@ -0,0 +1,108 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from google import genai
+from google.genai import types
+
+
+class GenAIClientRegistry:
+    """
+    Process-wide cache of genai.Client instances keyed by (api_key, model).
+
+    Creating a client per request means a new HTTP connection pool and new
+    TLS handshakes every time; clients returned here are shared and use a
+    pooled httpx transport sized by GENAI_MAX_CONNECTIONS (default 20).
+    GEMINI_BASE_URL points the clients at another endpoint, e.g. a proxy or
+    a local fake model server. GENAI_BACKEND=fake replaces Gemini with the
+    in-process FakeGenAIBackend (no API key or network needed).
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        self._backend = backend
+        self._clients: Dict[Tuple[str, str], genai.Client] = {}
+        self._lock = threading.Lock()
+        self._fake = None
+        self.created = 0
+        self.reused = 0
+
+    @property
+    def backend(self) -> str:
+        # read on first use, after .env files have been loaded
+        if self._backend is None:
+            backend = os.getenv("GENAI_BACKEND", "gemini")
+            if backend not in ("gemini", "fake"):
+                raise ValueError("GENAI_BACKEND must be 'gemini' or 'fake'")
+            self._backend = backend
+        return self._backend
+
+    def resolve_api_key(self, api_key: Optional[str] = None) -> str:
+        """Returns the API key to use; only the fake backend works without one."""
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            if self.backend == "fake":
+                return "fake"
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        return api_key
+
+    def _new_client(self, api_key: str):
+        if self.backend == "fake":
+            from src.fake_genai import FakeClient, FakeGenAIBackend
+            if self._fake is None:
+                # one backend shared by all clients, so its counters cover everything
+                self._fake = FakeGenAIBackend()
+            return FakeClient(self._fake)
+        return genai.Client(api_key=api_key, http_options=self._http_options())
+
+    def _http_options(self) -> types.HttpOptions:
+        max_connections = int(os.getenv("GENAI_MAX_CONNECTIONS", "20"))
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections,
+                              keepalive_expiry=60)
+        return types.HttpOptions(
+            base_url=os.getenv("GEMINI_BASE_URL") or None,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+
+    def get(self, api_key: Optional[str] = None, model_name: str = "") -> genai.Client:
+        """Returns the shared client for this API key and model, creating it on first use."""
+        api_key = self.resolve_api_key(api_key)
+        key = (api_key, model_name)
+        client = self._clients.get(key)
+        if client is not None:
+            self.reused += 1
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._new_client(api_key)
+                self._clients[key] = client
+                self.created += 1
+            else:
+                self.reused += 1
+            return client
+
+    def stats(self) -> dict:
+        stats = {
+            "backend": self.backend,
+            "clients": len(self._clients),
+            "models": sorted({model for _, model in self._clients}),
+            "created": self.created,
+            "reused": self.reused,
+        }
+        if self._fake is not None:
+            stats["fake"] = self._fake.stats()
+        return stats
+
+
+client_registry = GenAIClientRegistry()
+
+
+def get_client(api_key: Optional[str] = None, model_name: str = "") -> genai.Client:
+    return client_registry.get(api_key, model_name)
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    return client_registry.resolve_api_key(api_key)
@@ -0,0 +1,146 @@
+import itertools
+import json
+import os
+import threading
+from typing import Any, Callable, List, Optional
+
+import grpc
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# Idempotent reads that are safe to retry; other calls (AddItem,
+# SendOrderConfirmation, ...) are sent once
+RETRYABLE_METHODS = [
+    {"service": "hipstershop.ProductCatalogService", "method": "ListProducts"},
+    {"service": "hipstershop.ProductCatalogService", "method": "GetProduct"},
+    {"service": "hipstershop.ProductCatalogService", "method": "SearchProducts"},
+]
+
+
+def _service_config(timeout: float, max_attempts: int) -> str:
+    """Builds the gRPC service config: round_robin LB, a deadline for all methods and retries for RETRYABLE_METHODS."""
+    method_config = [{"name": [{}], "timeout": f"{timeout:.3f}s"}]
+    # gRPC rejects a retryPolicy with fewer than 2 attempts
+    if max_attempts >= 2:
+        method_config.append({
+            "name": RETRYABLE_METHODS,
+            "timeout": f"{timeout:.3f}s",
+            "retryPolicy": {
+                "maxAttempts": max_attempts,
+                "initialBackoff": "0.1s",
+                "maxBackoff": "1s",
+                "backoffMultiplier": 2,
+                "retryableStatusCodes": ["UNAVAILABLE", "RESOURCE_EXHAUSTED"],
+            },
+        })
+    return json.dumps({
+        "loadBalancingConfig": [{"round_robin": {}}],
+        "methodConfig": method_config,
+    })
+
+
+class ChannelPool:
+    """
+    Pool of gRPC channels to a single target.
+
+    Each channel has its own subchannels (HTTP/2 connections) resolved over
+    DNS with round_robin, so load spreads across backend pods instead of
+    being pinned to one connection. Configured through environment variables:
+
+        GRPC_POOL_SIZE                channels per target (default 4)
+        GRPC_DEFAULT_TIMEOUT_SECONDS  per-RPC deadline when none is given (default 5)
+        GRPC_KEEPALIVE_TIME_MS        keepalive ping interval (default 300000, the
+                                      backends' minimum; faster pings get GOAWAY)
+        GRPC_MAX_ATTEMPTS             attempts per catalog read incl. retries
+                                      (default 3, 1 disables retries)
+    """
+
+    def __init__(self,
+                 target: str,
+                 size: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 keepalive_time_ms: Optional[int] = None,
+                 max_attempts: Optional[int] = None):
+        self.target = target if "://" in target or target.startswith("dns:") else f"dns:///{target}"
+        self.size = max(1, size or _env_int("GRPC_POOL_SIZE", 4))
+        self.timeout = timeout or _env_float("GRPC_DEFAULT_TIMEOUT_SECONDS", 5.0)
+        keepalive_time_ms = keepalive_time_ms or _env_int("GRPC_KEEPALIVE_TIME_MS", 300000)
+        max_attempts = max_attempts or _env_int("GRPC_MAX_ATTEMPTS", 3)
+
+        options = [
+            ("grpc.service_config", _service_config(self.timeout, max_attempts)),
+            ("grpc.enable_retries", 1),
+            ("grpc.keepalive_time_ms", keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", 10000),
+            # without this all channels would share the same subchannels
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+        self.channels: List[grpc.Channel] = [
+            grpc.insecure_channel(self.target, options=options) for _ in range(self.size)
+        ]
+        self._in_flight = [0] * self.size
+        self._calls = [0] * self.size
+        self._errors = [0] * self.size
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    def _acquire(self) -> int:
+        """Picks the channel with the fewest in-flight RPCs, round-robin on ties."""
+        with self._lock:
+            start = next(self._next) % self.size
+            order = [(start + i) % self.size for i in range(self.size)]
+            i = min(order, key=lambda j: self._in_flight[j])
+            self._in_flight[i] += 1
+            self._calls[i] += 1
+            return i
+
+    def _release(self, i: int, failed: bool) -> None:
+        with self._lock:
+            self._in_flight[i] -= 1
+            if failed:
+                self._errors[i] += 1
+
+    def stub(self, stub_class: Callable[[grpc.Channel], Any]) -> "PooledStub":
+        return PooledStub(self, [stub_class(channel) for channel in self.channels])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "target": self.target,
+                "channels": [
+                    {"in_flight": self._in_flight[i], "calls": self._calls[i], "errors": self._errors[i]}
+                    for i in range(self.size)
+                ],
+            }
+
+    def close(self) -> None:
+        for channel in self.channels:
+            channel.close()
+
+
+class PooledStub:
+    """Drop-in replacement for a generated stub that spreads calls over a ChannelPool."""
+
+    def __init__(self, pool: ChannelPool, stubs: list):
+        self._pool = pool
+        self._stubs = stubs
+
+    def __getattr__(self, method: str) -> Callable:
+        def call(request, timeout: Optional[float] = None, **kwargs):
+            i = self._pool._acquire()
+            failed = True
+            try:
+                response = getattr(self._stubs[i], method)(
+                    request, timeout=timeout or self._pool.timeout, **kwargs)
+                failed = False
+                return response
+            finally:
+                self._pool._release(i, failed)
+        return call
@@ -1,21 +1,60 @@
-import os
-from typing import List, Optional
+import time
+from collections import Counter
+from enum import Enum
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
 from io import BytesIO
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from pydantic import Field, create_model
+
+from src.genai_clients import get_client, resolve_api_key
+from src.model_limits import model_limiter
+from src.mime import ensure_supported_image
+from src.product_classifier import product_choice
 
 load_dotenv()  # Carrega variáveis de ambiente do arquivo .env
 
 
+def _image_from_parts(parts) -> Optional[BytesIO]:
+    """Returns the first inline image of a response as BytesIO, if any."""
+    for part in parts or []:
+        if part.inline_data and part.inline_data.data:
+            image_bytesio = BytesIO(part.inline_data.data)
+            image_bytesio.seek(0)  # Reset position to beginning
+            return image_bytesio
+    return None
+
+
+def _chunk_parts(chunk) -> list:
+    if (
+        chunk.candidates is None
+        or chunk.candidates[0].content is None
+        or chunk.candidates[0].content.parts is None
+    ):
+        return []
+    return chunk.candidates[0].content.parts
+
+
+def _text_from_response(response) -> str:
+    """Extracts the first text part of a response."""
+    # Extrai texto do response
+    for part in response.candidates[0].content.parts:
+        if hasattr(part, 'text') and part.text:
+            return part.text
+        elif hasattr(part, 'inline_data') and part.inline_data and part.inline_data.data:
+            try:
+                return part.inline_data.data.decode('utf-8')
+            except Exception:
+                pass
+    raise ValueError("No text found in response")
+
+
 class ImageRemixService:
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set.")
-        self.client = genai.Client(api_key=self.api_key)
+        self.api_key = resolve_api_key(api_key)
         self.model_name = "gemini-2.5-flash-image-preview"
+        self.client = get_client(self.api_key, self.model_name)
 
     def _bytes_to_genai_part(self, image_bytes: bytes, mime_type: str) -> types.Part:
         """Converts image bytes to GenAI Part object."""
@@ -23,20 +62,6 @@ class ImageRemixService:
             inline_data=types.Blob(data=image_bytes, mime_type=mime_type)
         )
 
-    def _detect_mime_type(self, image_bytes: bytes) -> str:
-        """Detects MIME type from image bytes."""
-        # Check image signature to determine format
-        if image_bytes.startswith(b'\xff\xd8'):
-            return 'image/jpeg'
-        elif image_bytes.startswith(b'\x89PNG'):
-            return 'image/png'
-        elif image_bytes.startswith(b'GIF'):
-            return 'image/gif'
-        elif image_bytes.startswith(b'WEBP', 8):
-            return 'image/webp'
-        else:
-            return 'image/jpeg'  # default fallback
-
     def remix_images_from_bytes(
         self,
         image1_bytes: bytes,
@@ -56,9 +81,74 @@ class ImageRemixService:
         Returns:
             BytesIO: The remixed image as BytesIO object
         """
-        # Detect MIME types
-        mime_type1 = self._detect_mime_type(image1_bytes)
-        mime_type2 = self._detect_mime_type(image2_bytes)
+        contents, generate_content_config = self._build_request(image1_bytes, image2_bytes, prompt)
+
+        if stream:
+            return self._process_stream_response(contents, generate_content_config)
+        else:
+            return self._process_response(contents, generate_content_config)
+
+    async def remix_images_from_bytes_async(
+        self,
+        image1_bytes: bytes,
+        image2_bytes: bytes,
+        prompt: str,
+        stream: bool = False
+    ) -> BytesIO:
+        """Async version of remix_images_from_bytes, does not block the event loop."""
+        contents, config = self._build_request(image1_bytes, image2_bytes, prompt)
+
+        async with model_limiter.acquire(self.model_name):
+            if not stream:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=contents,
+                    config=config,
+                )
+                image_bytesio = _image_from_parts(response.candidates[0].content.parts)
+                if image_bytesio is None:
+                    raise ValueError("No image found in response")
+                return image_bytesio
+
+            async for chunk in await self.client.aio.models.generate_content_stream(
+                model=self.model_name,
+                contents=contents,
+                config=config,
+            ):
+                image_bytesio = _image_from_parts(_chunk_parts(chunk))
+                if image_bytesio is not None:
+                    return image_bytesio
+            raise ValueError("No image found in streaming response")
+
+    async def stream_remix_parts(
+        self,
+        image1_bytes: bytes,
+        image2_bytes: bytes,
+        prompt: str
+    ) -> AsyncIterator[types.Part]:
+        """
+        Yields the response parts (text or inline image) as the model streams them.
+
+        Nothing is buffered or copied: image parts carry the bytes received
+        from the API. The model concurrency slot is held until the
+        generator is exhausted or closed.
+        """
+        contents, config = self._build_request(image1_bytes, image2_bytes, prompt)
+
+        async with model_limiter.acquire(self.model_name):
+            async for chunk in await self.client.aio.models.generate_content_stream(
+                model=self.model_name,
+                contents=contents,
+                config=config,
+            ):
+                for part in _chunk_parts(chunk):
+                    yield part
+
+    def _build_request(self, image1_bytes: bytes, image2_bytes: bytes, prompt: str):
+        """Builds the contents and config for a remix request."""
+        # Detect MIME types (formats the model does not take are converted)
+        image1_bytes, mime_type1 = ensure_supported_image(image1_bytes)
+        image2_bytes, mime_type2 = ensure_supported_image(image2_bytes)
 
         # Create GenAI parts
         contents = [
@@ -70,11 +160,7 @@ class ImageRemixService:
         generate_content_config = types.GenerateContentConfig(
             response_modalities=["IMAGE", "TEXT"],
         )
-
-        if stream:
-            return self._process_stream_response(contents, generate_content_config)
-        else:
-            return self._process_response(contents, generate_content_config)
+        return contents, generate_content_config
 
     def _process_response(self, contents: List[types.Part], config: types.GenerateContentConfig) -> BytesIO:
         """Process non-streaming response and return image as BytesIO."""
@@ -85,11 +171,9 @@ class ImageRemixService:
         )
 
         # Extract image from response
-        for part in response.candidates[0].content.parts:
-            if part.inline_data and part.inline_data.data:
-                image_bytesio = BytesIO(part.inline_data.data)
-                image_bytesio.seek(0)  # Reset position to beginning
-                return image_bytesio
+        image_bytesio = _image_from_parts(response.candidates[0].content.parts)
+        if image_bytesio is not None:
+            return image_bytesio
 
         raise ValueError("No image found in response")
 
@@ -102,18 +186,9 @@ class ImageRemixService:
         )
 
         for chunk in stream:
-            if (
-                chunk.candidates is None
-                or chunk.candidates[0].content is None
-                or chunk.candidates[0].content.parts is None
-            ):
-                continue
-
-            for part in chunk.candidates[0].content.parts:
-                if part.inline_data and part.inline_data.data:
-                    image_bytesio = BytesIO(part.inline_data.data)
-                    image_bytesio.seek(0)  # Reset position to beginning
-                    return image_bytesio
+            image_bytesio = _image_from_parts(_chunk_parts(chunk))
+            if image_bytesio is not None:
+                return image_bytesio
 
         raise ValueError("No image found in streaming response")
 
@@ -141,15 +216,24 @@ def remix_images_service(
     service = ImageRemixService(api_key)
     return service.remix_images_from_bytes(image1_bytes, image2_bytes, prompt, stream)
 
+async def remix_images_service_async(
+    image1_bytes: bytes,
+    image2_bytes: bytes,
+    prompt: str,
+    api_key: Optional[str] = None,
+    stream: bool = False
+) -> BytesIO:
+    """Async version of remix_images_service."""
+    service = ImageRemixService(api_key)
+    return await service.remix_images_from_bytes_async(image1_bytes, image2_bytes, prompt, stream)
+
 class ImageDescriptionService:
     def __init__(self, 
                  api_key: Optional[str] = None,
                  model_name: str="gemini-2.5-flash-image-preview"):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set.")
-        self.client = genai.Client(api_key=self.api_key)
+        self.api_key = resolve_api_key(api_key)
         self.model_name = model_name
+        self.client = get_client(self.api_key, self.model_name)
 
     def _bytes_to_genai_part(self, image_bytes: bytes, mime_type: str) -> types.Part:
         """Converts image bytes to GenAI Part object."""
@@ -157,42 +241,35 @@ class ImageDescriptionService:
             inline_data=types.Blob(data=image_bytes, mime_type=mime_type)
         )
 
-    def _detect_mime_type(self, image_bytes: bytes) -> str:
-        """Detects MIME type from image bytes."""
-        if image_bytes.startswith(b'\xff\xd8'):
-            return 'image/jpeg'
-        elif image_bytes.startswith(b'\x89PNG'):
-            return 'image/png'
-        elif image_bytes.startswith(b'GIF'):
-            return 'image/gif'
-        elif image_bytes.startswith(b'WEBP', 8):
-            return 'image/webp'
-        else:
-            return 'image/jpeg'  # default fallback
-
-    def describe_image_from_bytes(self, image_bytes: bytes, prompt: Optional[str] = None, stream: bool = False) -> str:
-        """Descreve uma imagem a partir de bytes usando Gemini AI e retorna texto."""
-        mime_type = self._detect_mime_type(image_bytes)
+    def _build_request(self, image_bytes: bytes, prompt: Optional[str]):
+        image_bytes, mime_type = ensure_supported_image(image_bytes)
         content = [
             self._bytes_to_genai_part(image_bytes, mime_type),
             types.Part.from_text(text=prompt) if prompt else types.Part.from_text(text="Describe this image."),
         ]
         generate_content_config = types.GenerateContentConfig(response_modalities=["TEXT"])
+        return content, generate_content_config
+
+    def describe_image_from_bytes(self, image_bytes: bytes, prompt: Optional[str] = None, stream: bool = False) -> str:
+        """Descreve uma imagem a partir de bytes usando Gemini AI e retorna texto."""
+        content, generate_content_config = self._build_request(image_bytes, prompt)
         response = self.client.models.generate_content(
             model=self.model_name,
             contents=content,
             config=generate_content_config,
         )
-        # Extrai texto do response
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, 'text') and part.text:
-                return part.text
-            elif hasattr(part, 'inline_data') and part.inline_data and part.inline_data.data:
-                try:
-                    return part.inline_data.data.decode('utf-8')
-                except Exception:
-                    pass
-        raise ValueError("No text found in response")
+        return _text_from_response(response)
+
+    async def describe_image_from_bytes_async(self, image_bytes: bytes, prompt: Optional[str] = None) -> str:
+        """Async version of describe_image_from_bytes."""
+        content, generate_content_config = self._build_request(image_bytes, prompt)
+        async with model_limiter.acquire(self.model_name):
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=content,
+                config=generate_content_config,
+            )
+        return _text_from_response(response)
 
 def describe_image_service(image_bytes: bytes, 
                            prompt: str, 
@@ -203,59 +280,85 @@ def describe_image_service(image_bytes: bytes,
                                       model_name=model_name)
     return service.describe_image_from_bytes(image_bytes, prompt)
 
-# Lista explícita dos produtos que podem ser usados ou vestidos
-POSSIBLE_PRODUCTS = [
-    "Sunglasses",  # óculos de sol
-    "Tank Top",    # regata/camiseta
-    "Watch",       # relógio
-    "Loafers"      # sapatos/mocassins
-]
-
-IDS = {
-    "Sunglasses": "OLJCESPC7Z",
-    "Tank Top": "66VCHSJNUP",
-    "Watch": "1YMWWN1N4O",
-    "Loafers": "L9ECAV7KIM",
-    "None": "None"
-}
-
-class ProductChoice(BaseModel):
-    product: str = Field(..., description="Escolha do produto: Sunglasses, Tank Top, Watch, Loafers ou Nenhum.", example=["Sunglasses", "Tank Top", "Watch", "Loafers", "Nenhum"])
+async def describe_image_service_async(image_bytes: bytes,
+                                       prompt: str,
+                                       api_key: Optional[str] = None,
+                                       model_name: str="gemini-2.5-flash-image-preview") -> str:
+    """Async version of describe_image_service."""
+    service = ImageDescriptionService(api_key,
+                                      model_name=model_name)
+    return await service.describe_image_from_bytes_async(image_bytes, prompt)
+
+NO_PRODUCT = "Nenhum"
 
-def analyze_product_choice(text: str, 
-                           model_name: str="gemini-2.5-flash") -> list[ProductChoice]:
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+@lru_cache(maxsize=8)
+def _product_choice_model(candidates: Tuple[Tuple[str, str], ...]) -> type:
+    """ProductChoice schema whose `product` enum is the candidate labels (member names are IDs)."""
+    names = Enum("ProductName", list(candidates) + [("NONE", NO_PRODUCT)], type=str)
+    return create_model(
+        "ProductChoice",
+        product=(names, Field(..., description=f"Escolha do produto ou {NO_PRODUCT}.")),
+    )
+
+def _product_labels(products: List[dict]) -> List[Tuple[str, str]]:
+    """(id, label) pairs; a name shared by several products gets the ID, so enum values stay unique."""
+    counts = Counter(product["name"] for product in products)
+    return [(product["id"], product["name"] if counts[product["name"]] == 1
+             else f"{product['name']} ({product['id']})") for product in products]
+
+def _product_choice_request(text: str, products: List[dict]):
+    """Prompt and config for the current candidates, from the cached catalog."""
+    candidates = tuple(_product_labels(products))
+    config = {
+        "response_mime_type": "application/json",
+        "response_schema": list[_product_choice_model(candidates)],
+    }
     prompt = (
         "Você é um assistente muito útil. Analise o texto do usuário e responda de forma clara e objetiva qual produto ele deseja vestir ou usar dentre as opções abaixo. "
-        "Se não quiser nenhum, responda explicitamente 'Nenhum'.\n"
+        f"Se não quiser nenhum, responda explicitamente '{NO_PRODUCT}'.\n"
         "Produtos disponíveis:\n"
-        "- Sunglasses (óculos de sol)\n"
-        "- Tank Top (regata/camiseta)\n"
-        "- Watch (relógio)\n"
-        "- Loafers (sapatos/mocassins)\n"
-        "\nTexto do usuário: '" + text + "'\nResposta:"
+        + "".join(f"- {label} ({', '.join(product['categories'])})\n"
+                  for (_, label), product in zip(candidates, products))
+        + "\nTexto do usuário: '" + text + "'\nResposta:"
     )
+    return prompt, config
+
+def analyze_product_choice(text: str, 
+                           model_name: str="gemini-2.5-flash",
+                           products: Optional[List[dict]] = None) -> list:
+    """Asks the model which of `products` (default: the catalog candidates) the user wants."""
+    prompt, config = _product_choice_request(text, products if products is not None else product_choice.candidates)
+    client = get_client(model_name=model_name)
     response = client.models.generate_content(
         model=model_name,
         contents=[prompt],
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": list[ProductChoice],
-        },
+        config=config,
     )
     return response.parsed
 
+async def analyze_product_choice_async(text: str,
+                                       model_name: str="gemini-2.5-flash",
+                                       products: Optional[List[dict]] = None) -> list:
+    """Async version of analyze_product_choice."""
+    prompt, config = _product_choice_request(text, products if products is not None else product_choice.candidates)
+    client = get_client(model_name=model_name)
+    async with model_limiter.acquire(model_name):
+        response = await client.aio.models.generate_content(
+            model=model_name,
+            contents=[prompt],
+            config=config,
+        )
+    return response.parsed
+
 class ImageSellProductService:
     def __init__(self, 
                  api_key: Optional[str] = None,
                  model_name: str="gemini-2.5-flash-image-preview",
                  text: str="I really like sunglasses, can you help me?"):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        self.api_key = resolve_api_key(api_key)
         # print(self.api_key)
-        self.client = genai.Client(api_key=self.api_key)
         self.model_name = model_name
+        self.client = get_client(self.api_key, self.model_name)
         self.text = text
 
     def _classify_text(self, text: str) -> str:
@@ -270,30 +373,42 @@ class ImageSellProductService:
             inline_data=types.Blob(data=image_bytes, mime_type=mime_type)
         )
 
-    def _detect_mime_type(self, image_bytes: bytes) -> str:
-        """Detects MIME type from image bytes."""
-        if image_bytes.startswith(b'\xff\xd8'):
-            return 'image/jpeg'
-        elif image_bytes.startswith(b'\x89PNG'):
-            return 'image/png'
-        elif image_bytes.startswith(b'GIF'):
-            return 'image/gif'
-        elif image_bytes.startswith(b'WEBP', 8):
-            return 'image/webp'
-        else:
-            return 'image/jpeg'  # default fallback
-
     def _format_product(self, product: dict) -> str:
         return f"ID: {product['id']}, Nome: {product['name']}, Descrição: {product['description']}, Preço: {product['price']}, Categoria: {product['categories']}"
 
     def extract_product_from_text(self, text: str) -> dict:
-        """Extracts the product choice from text."""
+        """
+        Extracts the product choice from text.
+
+        The local keyword classifier answers when it is confident; the LLM
+        is only asked for ambiguous queries.
+        """
+        product = product_choice.classify_local(text)
+        if product is not None:
+            return {"name": product["name"], "id": product["id"]}
+        start = time.perf_counter()
         choices = self._classify_text(text)
-        if choices and choices[0].product in POSSIBLE_PRODUCTS:
-            return {"name": choices[0].product,
-                    "id": IDS[choices[0].product]}
+        product_choice.record_llm((time.perf_counter() - start) * 1000)
+        return self._product_from_choices(choices)
+
+    async def extract_product_from_text_async(self, text: str) -> dict:
+        """Async version of extract_product_from_text."""
+        product = product_choice.classify_local(text)
+        if product is not None:
+            return {"name": product["name"], "id": product["id"]}
+        start = time.perf_counter()
+        choices = await analyze_product_choice_async(text, model_name="gemini-2.5-flash")
+        product_choice.record_llm((time.perf_counter() - start) * 1000)
+        return self._product_from_choices(choices)
+
+    def _product_from_choices(self, choices) -> dict:
+        # enum member names are product IDs
+        product = product_choice.get(choices[0].product.name) if choices else None
+        if product is not None:
+            return {"name": product["name"],
+                    "id": product["id"]}
         return {"name": "None",
-                "id": IDS["None"]}
+                "id": "None"}
 
     def sell_product_from_image_from_bytes(self, 
                                            image_bytes: bytes, 
@@ -301,7 +416,30 @@ class ImageSellProductService:
                                            product: dict = {},
                                            stream: bool = False) -> str:
         """Descreve uma imagem a partir de bytes usando Gemini AI e retorna texto."""
-        mime_type = self._detect_mime_type(image_bytes)
+        content, generate_content_config = self._build_request(image_bytes, prompt, product)
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=content,
+            config=generate_content_config,
+        )
+        return _text_from_response(response)
+
+    async def sell_product_from_image_from_bytes_async(self,
+                                                       image_bytes: bytes,
+                                                       prompt: Optional[str] = None,
+                                                       product: dict = {}) -> str:
+        """Async version of sell_product_from_image_from_bytes."""
+        content, generate_content_config = self._build_request(image_bytes, prompt, product)
+        async with model_limiter.acquire(self.model_name):
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=content,
+                config=generate_content_config,
+            )
+        return _text_from_response(response)
+
+    def _build_request(self, image_bytes: bytes, prompt: Optional[str], product: dict):
+        image_bytes, mime_type = ensure_supported_image(image_bytes)
         content = [
             self._bytes_to_genai_part(image_bytes, mime_type),
             types.Part.from_text(text="User Text: " + self.text),
@@ -309,21 +447,7 @@ class ImageSellProductService:
             types.Part.from_text(text=prompt) if prompt else types.Part.from_text(text="Describe this image."),
         ]
         generate_content_config = types.GenerateContentConfig(response_modalities=["TEXT"])
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=content,
-            config=generate_content_config,
-        )
-        # Extrai texto do response
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, 'text') and part.text:
-                return part.text
-            elif hasattr(part, 'inline_data') and part.inline_data and part.inline_data.data:
-                try:
-                    return part.inline_data.data.decode('utf-8')
-                except Exception:
-                    pass
-        raise ValueError("No text found in response")
+        return content, generate_content_config
     
 def sell_product_from_image_service(image_bytes: bytes, 
                                     text: str,
@@ -0,0 +1,99 @@
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+# Formats Gemini accepts as inline image data
+SUPPORTED_MIME_TYPES = frozenset({
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "image/heic",
+    "image/heif",
+})
+
+# (offset, magic bytes, MIME type), checked in order
+SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"BM", "image/bmp"),
+)
+
+# ISO base media files (HEIF, AVIF) are told apart by the brands of their ftyp box
+FTYP_BRANDS = {
+    b"avif": "image/avif",
+    b"avis": "image/avif",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"hevc": "image/heic",
+    b"hevx": "image/heic",
+    b"heim": "image/heic",
+    b"heis": "image/heic",
+    b"mif1": "image/heif",
+    b"msf1": "image/heif",
+}
+
+
+class UnsupportedImageError(ValueError):
+    """Raised for uploads that are not an image the model can take."""
+
+
+def _ftyp_mime_type(data: bytes) -> Optional[str]:
+    box_size = int.from_bytes(data[0:4], "big")
+    brands = [data[8:12]]
+    # compatible brands follow the major brand and minor version
+    brands += [data[i:i + 4] for i in range(16, min(box_size, len(data)) - 3, 4)]
+    # specific brands win over the generic mif1/msf1
+    found = [FTYP_BRANDS[brand] for brand in brands if brand in FTYP_BRANDS]
+    for mime_type in ("image/avif", "image/heic", "image/heif"):
+        if mime_type in found:
+            return mime_type
+    return None
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Returns the image MIME type from the file signature, or None if unknown."""
+    for offset, magic, mime_type in SIGNATURES:
+        if data.startswith(magic, offset):
+            return mime_type
+    if data.startswith(b"RIFF") and data.startswith(b"WEBP", 8):
+        return "image/webp"
+    if data.startswith(b"ftyp", 4):
+        return _ftyp_mime_type(data)
+    return None
+
+
+def transcode_image(data: bytes) -> bytes:
+    """Re-encodes an image Pillow can decode as PNG (first frame for animations)."""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            has_alpha = image.mode in ("RGBA", "LA", "P") and (
+                image.mode != "P" or "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            out = BytesIO()
+            image.save(out, format="PNG")
+    except Exception as e:
+        raise UnsupportedImageError(f"Image could not be converted: {e}")
+    return out.getvalue()
+
+
+def ensure_supported_image(data: bytes, transcode: bool = True) -> Tuple[bytes, str]:
+    """
+    Returns (bytes, MIME type) ready to send to the model.
+
+    Unknown data raises UnsupportedImageError. Known formats the model does
+    not take (GIF, BMP, TIFF, AVIF) are converted to PNG when `transcode` is
+    set, otherwise rejected.
+    """
+    mime_type = sniff_mime_type(data)
+    if mime_type is None:
+        raise UnsupportedImageError("Unrecognized image format")
+    if mime_type in SUPPORTED_MIME_TYPES:
+        return data, mime_type
+    if not transcode:
+        raise UnsupportedImageError(f"{mime_type} images are not supported")
+    return transcode_image(data), "image/png"
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+def _parse_overrides(value: str) -> Dict[str, int]:
+    """Parses "model-a=8,model-b=32" into {"model-a": 8, "model-b": 32}."""
+    overrides = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            overrides[model.strip()] = int(limit)
+    return overrides
+
+
+class _ModelSlot:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+
+class ModelLimiter:
+    """
+    Bounds the number of concurrent Gemini calls per model.
+
+    Calls beyond the limit wait on the event loop instead of piling up on
+    the API. Limits come from GENAI_MAX_CONCURRENCY (default 16) and can be
+    set per model with GENAI_MODEL_CONCURRENCY="model=limit,...".
+    """
+
+    def __init__(self):
+        self.default_limit = int(os.getenv("GENAI_MAX_CONCURRENCY", "16"))
+        self.overrides = _parse_overrides(os.getenv("GENAI_MODEL_CONCURRENCY", ""))
+        self._slots: Dict[str, _ModelSlot] = {}
+
+    def _slot(self, model_name: str) -> _ModelSlot:
+        slot = self._slots.get(model_name)
+        if slot is None:
+            slot = _ModelSlot(self.overrides.get(model_name, self.default_limit))
+            self._slots[model_name] = slot
+        return slot
+
+    @asynccontextmanager
+    async def acquire(self, model_name: str):
+        slot = self._slot(model_name)
+        slot.waiting += 1
+        slot.max_waiting = max(slot.max_waiting, slot.waiting)
+        try:
+            await slot.semaphore.acquire()
+        finally:
+            slot.waiting -= 1
+        slot.in_flight += 1
+        try:
+            yield
+        except GeneratorExit:
+            # a streaming caller closed the generator once it had what it needed
+            slot.completed += 1
+            raise
+        except BaseException:
+            slot.failed += 1
+            raise
+        else:
+            slot.completed += 1
+        finally:
+            slot.in_flight -= 1
+            slot.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "limit": slot.limit,
+                "queue_depth": slot.waiting,
+                "max_queue_depth": slot.max_waiting,
+                "in_flight": slot.in_flight,
+                "completed": slot.completed,
+                "failed": slot.failed,
+            }
+            for model, slot in self._slots.items()
+        }
+
+
+model_limiter = ModelLimiter()
@@ -0,0 +1,179 @@
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# PT/EN synonyms of catalog names and categories, keyed by the casefolded catalog term
+SYNONYMS = {
+    "sunglasses": ["oculos de sol", "oculos escuros", "oculos", "shades", "sun glasses"],
+    "tank top": ["regata", "camiseta regata", "camiseta", "blusa", "top", "tank", "t shirt", "shirt"],
+    "watch": ["relogio", "relogio de pulso", "wristwatch"],
+    "loafers": ["mocassim", "mocassins", "sapato", "sapatos", "shoe", "shoes", "loafer"],
+    "hairdryer": ["secador", "secador de cabelo", "hair dryer", "blow dryer"],
+    "candle holder": ["castical", "porta vela", "vela", "candle"],
+    "salt & pepper shakers": ["saleiro", "pimenteiro", "sal e pimenta", "salt shaker"],
+    "bamboo glass jar": ["pote de vidro", "pote", "jarra", "jar"],
+    "mug": ["caneca", "xicara", "cup"],
+    "accessories": ["acessorio", "acessorios"],
+    "clothing": ["roupa", "roupas", "vestir", "clothes"],
+    "tops": ["parte de cima"],
+    "footwear": ["calcado", "calcados", "nos pes"],
+    "hair": ["cabelo"],
+    "beauty": ["beleza"],
+    "decor": ["decoracao"],
+    "home": ["casa"],
+    "kitchen": ["cozinha"],
+}
+
+# Queries with these words are left to the LLM ("não quero óculos", "I don't want a watch")
+NEGATIONS = {"nao", "not", "nem", "nenhum", "nenhuma", "nada", "sem", "without",
+             "never", "nunca", "don", "doesn", "didn", "dont"}
+
+NAME_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+MAX_PHRASE_TOKENS = 4
+
+_NON_WORD = re.compile(r"[^a-z0-9&]+")
+
+
+def _tokens(text: str) -> List[str]:
+    """Casefolds, strips accents and crude plural endings, and splits into words."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for token in _NON_WORD.split(text):
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def _term(text: str) -> str:
+    return " ".join(_tokens(text))
+
+
+class ProductClassifier:
+    """
+    Keyword/synonym classifier over a fixed set of products.
+
+    The vocabulary is generated from the product names and categories plus
+    their SYNONYMS. Every term points at the products it names, with a
+    lower weight for category terms since they are shared.
+    """
+
+    def __init__(self, products: List[dict]):
+        self.products = {product["id"]: product for product in products}
+        self.terms: Dict[str, Dict[str, float]] = {}
+        for product in products:
+            self._add(product["name"], product["id"], NAME_WEIGHT)
+            for token in _tokens(product["name"]):
+                if len(token) > 2:
+                    self._add(token, product["id"], NAME_WEIGHT)
+            for category in product["categories"]:
+                self._add(category, product["id"], CATEGORY_WEIGHT)
+
+    def _add(self, text: str, product_id: str, weight: float) -> None:
+        for term in [text] + SYNONYMS.get(text.casefold(), []):
+            weights = self.terms.setdefault(_term(term), {})
+            weights[product_id] = max(weights.get(product_id, 0.0), weight)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        tokens = _tokens(text)
+        scores: Dict[str, float] = {}
+        for n in range(1, MAX_PHRASE_TOKENS + 1):
+            for i in range(len(tokens) - n + 1):
+                for product_id, weight in self.terms.get(" ".join(tokens[i:i + n]), {}).items():
+                    scores[product_id] = scores.get(product_id, 0.0) + weight
+        return scores
+
+    def classify(self, text: str) -> Tuple[Optional[dict], float]:
+        """
+        Returns (product, confidence in [0, 1]).
+
+        Confidence is the best product's share of the total score, scaled
+        down when only category terms matched; negated queries get 0.
+        """
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        product_id, top = max(scores.items(), key=lambda item: item[1])
+        if NEGATIONS.intersection(_tokens(text)):
+            return self.products[product_id], 0.0
+        confidence = (top / sum(scores.values())) * min(1.0, top / NAME_WEIGHT)
+        return self.products[product_id], confidence
+
+
+class TieredProductChoice:
+    """
+    Products a user can pick in /sell-product-from-query and the local tier
+    of that choice: answers confident queries from a ProductClassifier and
+    leaves the rest to the LLM, counting both tiers.
+
+    The candidates are the catalog products in PRODUCT_CHOICE_CATEGORIES
+    (the wearable ones, default accessories,clothing,footwear).
+    PRODUCT_CHOICE_LOCAL=0 sends everything to the LLM;
+    PRODUCT_CHOICE_THRESHOLD is the minimum local confidence (default 0.6).
+    """
+
+    def __init__(self, threshold: Optional[float] = None, categories: Optional[List[str]] = None):
+        self.enabled = os.getenv("PRODUCT_CHOICE_LOCAL", "1") == "1"
+        self.threshold = threshold or float(os.getenv("PRODUCT_CHOICE_THRESHOLD", "0.6"))
+        self.categories = categories or [
+            category.strip() for category in
+            os.getenv("PRODUCT_CHOICE_CATEGORIES", "accessories,clothing,footwear").split(",")
+            if category.strip()]
+        self._classifier = ProductClassifier([])
+        self.local_answers = 0
+        self.llm_answers = 0
+        self.local_ms = 0.0
+        self.llm_ms = 0.0
+
+    def load(self, snapshot) -> None:
+        """Picks the candidates from a catalog snapshot and rebuilds the vocabulary."""
+        candidates: Dict[str, dict] = {}
+        for category in self.categories:
+            for product in snapshot.find_by_category(category):
+                candidates.setdefault(product["id"], product)
+        # keep catalog order
+        self._classifier = ProductClassifier(
+            [product for product in snapshot.products if product["id"] in candidates])
+
+    @property
+    def candidates(self) -> List[dict]:
+        return list(self._classifier.products.values())
+
+    def get(self, product_id: str) -> Optional[dict]:
+        """Returns a candidate product by ID."""
+        return self._classifier.products.get(product_id)
+
+    def classify_local(self, text: str) -> Optional[dict]:
+        """Returns the product when the local tier is confident, otherwise None."""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        product, confidence = self._classifier.classify(text)
+        self.local_ms += (time.perf_counter() - start) * 1000
+        if product is None or confidence < self.threshold:
+            return None
+        self.local_answers += 1
+        return product
+
+    def record_llm(self, elapsed_ms: float) -> None:
+        self.llm_answers += 1
+        self.llm_ms += elapsed_ms
+
+    def stats(self) -> dict:
+        answers = self.local_answers + self.llm_answers
+        return {
+            "candidates": len(self._classifier.products),
+            "local_answers": self.local_answers,
+            "llm_answers": self.llm_answers,
+            "local_rate": round(self.local_answers / answers, 4) if answers else 0.0,
+            "avg_llm_ms": round(self.llm_ms / self.llm_answers, 3) if self.llm_answers else 0.0,
+            "total_local_ms": round(self.local_ms, 3),
+        }
+
+
+product_choice = TieredProductChoice()
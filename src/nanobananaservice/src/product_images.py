@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+
+from src.image_preprocess import preprocess_image
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProductImageStore:
+    """
+    Catalog pictures held in memory, keyed by product ID.
+
+    Pictures are loaded when a new catalog snapshot arrives, so requests
+    read them from a dict without touching the filesystem. A picture missing
+    locally is fetched from PRODUCT_IMAGES_BASE_URL (e.g. the frontend,
+    which serves the same /static/img/products paths) when that is set.
+
+    PRODUCT_IMAGES_DIR   directory the picture paths are relative to (default: this service)
+    PRODUCT_IMAGE_MAX_EDGE  pre-resize pictures to this edge, 0 keeps them as is (default 1024)
+    """
+
+    def __init__(self,
+                 base_dir: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 max_edge: Optional[int] = None):
+        self.base_dir = base_dir or os.getenv("PRODUCT_IMAGES_DIR", SERVICE_DIR)
+        self.base_url = (base_url or os.getenv("PRODUCT_IMAGES_BASE_URL", "")).rstrip("/")
+        self.max_edge = max_edge if max_edge is not None else int(os.getenv("PRODUCT_IMAGE_MAX_EDGE", "1024"))
+        self._images: Dict[str, bytes] = {}
+        # picture path -> bytes, so unchanged pictures are not reloaded on refresh
+        self._by_picture: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.loaded_version = 0
+        self.local_loads = 0
+        self.remote_loads = 0
+        self.missing = 0
+
+    def _read(self, picture: str) -> Optional[bytes]:
+        path = os.path.join(self.base_dir, picture.lstrip("/"))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.local_loads += 1
+            return data
+        except OSError:
+            pass
+        if self.base_url:
+            try:
+                response = requests.get(self.base_url + "/" + picture.lstrip("/"), timeout=5)
+                response.raise_for_status()
+                self.remote_loads += 1
+                return response.content
+            except requests.RequestException as e:
+                print(f"Could not fetch product picture {picture}: {e}")
+        self.missing += 1
+        return None
+
+    def _load_picture(self, picture: str) -> Optional[bytes]:
+        data = self._by_picture.get(picture)
+        if data is None:
+            data = self._read(picture)
+            if data is not None and self.max_edge:
+                data, _ = preprocess_image(data, self.max_edge, "jpeg", 90)
+        return data
+
+    def load(self, snapshot) -> None:
+        """Loads the pictures of every product in a catalog snapshot."""
+        with self._lock:
+            if snapshot.version == self.loaded_version:
+                return
+            images = {}
+            by_picture = {}
+            for product in snapshot.products:
+                data = self._load_picture(product["picture"])
+                if data is not None:
+                    images[product["id"]] = data
+                    by_picture[product["picture"]] = data
+            self._images = images
+            self._by_picture = by_picture
+            self.loaded_version = snapshot.version
+
+    def get(self, product_id: str) -> Optional[bytes]:
+        return self._images.get(product_id)
+
+    def load_product(self, product: dict) -> bytes:
+        """Slow path for a product that is not in the store yet (blocking I/O)."""
+        data = self.get(product["id"])
+        if data is None:
+            data = self._load_picture(product["picture"])
+            if data is None:
+                raise FileNotFoundError(product["picture"])
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "version": self.loaded_version,
+            "images": len(self._images),
+            "bytes": sum(len(data) for data in self._images.values()),
+            "local_loads": self.local_loads,
+            "remote_loads": self.remote_loads,
+            "missing": self.missing,
+        }
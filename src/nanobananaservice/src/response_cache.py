@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+def cache_key(image_bytes: bytes, prompt: str, model_name: str) -> str:
+    """Content address of a model call: SHA-256 of the image, prompt hash and model."""
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    return f"{image_hash}-{prompt_hash}-{model_name}"
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of text responses with an optional on-disk tier.
+
+    Identical concurrent requests share a single model call; if the request
+    making it is cancelled, one of the waiting requests makes it instead.
+    Configured with DESCRIBE_CACHE_MAX_ENTRIES (default 1024),
+    DESCRIBE_CACHE_TTL_SECONDS (default 3600) and DESCRIBE_CACHE_DIR (disk
+    tier, disabled when unset).
+    """
+
+    def __init__(self,
+                 max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 directory: Optional[str] = None):
+        self.max_entries = max_entries or int(os.getenv("DESCRIBE_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl = ttl_seconds or float(os.getenv("DESCRIBE_CACHE_TTL_SECONDS", "3600"))
+        self.directory = directory or os.getenv("DESCRIBE_CACHE_DIR") or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_memory(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _get_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] < time.time():
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _set_disk(self, key: str, value: str, expires_at: float) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        os.replace(tmp_path, path)
+
+    async def get_or_compute(self,
+                             key: str,
+                             compute: Callable[[], Awaitable[str]],
+                             bypass: bool = False) -> Tuple[str, bool]:
+        """Returns (value, hit). With bypass the model is always called and the result stored."""
+        if bypass:
+            self.bypassed += 1
+        else:
+            value = self._get_memory(key)
+            if value is not None:
+                self.memory_hits += 1
+                return value, True
+            if self.directory:
+                entry = await asyncio.to_thread(self._get_disk, key)
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._set_memory(key, entry[1], entry[0])
+                    return entry[1], True
+            pending = self._pending.get(key)
+            while pending is not None:
+                # unlike awaiting the future, wait() does not raise when the
+                # leader's request is cancelled; a waiter then computes the
+                # value itself, or waits for the waiter that took over
+                await asyncio.wait([pending])
+                if not pending.cancelled():
+                    self.memory_hits += 1
+                    return pending.result(), True
+                pending = self._pending.get(key)
+            self.misses += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure does not log a warning
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        future.set_result(value)
+
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, value, expires_at)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._set_disk, key, value, expires_at)
+            except OSError as e:
+                print(f"Could not write response cache entry to disk: {e}")
+        return value, False
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """Collects per-stage durations of a request and renders a Server-Timing header."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Awaits `awaitable` and records how long it took under `name`."""
+        with self.stage(name):
+            return await awaitable
+
+    def header(self) -> str:
+        """Server-Timing value, e.g. `classify;dur=812.4, remix;dur=5230.1, total;dur=6120.0`."""
+        stages = dict(self.stages)
+        stages["total"] = (time.perf_counter() - self.started) * 1000
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in stages.items())
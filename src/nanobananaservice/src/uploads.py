@@ -0,0 +1,117 @@
+import asyncio
+import os
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from src.mime import sniff_mime_type
+
+# Per-file limit for image uploads and limit for a whole request body
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(2 * MAX_UPLOAD_BYTES + 1024 * 1024)))
+# Request body limit for batch endpoints
+MAX_BATCH_REQUEST_BYTES = int(os.getenv("MAX_BATCH_REQUEST_BYTES", str(512 * 1024 * 1024)))
+
+
+def _too_large(what: str, limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{what} exceeds the {limit} bytes limit")
+
+
+async def read_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Reads an uploaded file into a single bytes object of exactly its size.
+
+    Oversized files are rejected with 413 from the size recorded while
+    parsing the multipart body, before anything is copied. The read itself is
+    one bounded read from the spooled file, done off the event loop.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(f"File '{upload.filename}'", max_bytes)
+
+    upload.file.seek(0)
+    data = await asyncio.to_thread(upload.file.read, max_bytes + 1)
+    if len(data) > max_bytes:
+        raise _too_large(f"File '{upload.filename}'", max_bytes)
+    return data
+
+
+async def read_image_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Like read_upload, but rejects data without a known image signature with 415."""
+    data = await read_upload(upload, max_bytes)
+    if sniff_mime_type(data) is None:
+        raise HTTPException(status_code=415,
+                            detail=f"File '{upload.filename}' is not a supported image format")
+    return data
+
+
+def detach_upload(upload: UploadFile) -> BinaryIO:
+    """
+    Takes over the spooled file of an upload; the caller must close it.
+
+    FastAPI closes uploads as soon as the endpoint returns, before a
+    streamed response body is produced. Detached files stay open so a
+    streaming response can keep reading them.
+    """
+    file = upload.file
+    upload.file = BytesIO()
+    file.seek(0)
+    return file
+
+
+def read_detached(file: BinaryIO, max_bytes: Optional[int] = None) -> bytes:
+    """Reads a detached upload, raising ValueError above `max_bytes` (blocking)."""
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    data = file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"exceeds the {max_bytes} bytes limit")
+    return data
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that refuses request bodies above MAX_REQUEST_BYTES.
+
+    Requests announcing a larger Content-Length get 413 before the body is
+    read; chunked bodies are cut off with 413 as soon as they cross the limit,
+    so oversized uploads are never spooled completely. `path_limits` sets a
+    different limit for specific paths.
+    """
+
+    def __init__(self, app, max_body_bytes: Optional[int] = None,
+                 path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes or MAX_REQUEST_BYTES
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body_bytes = self.path_limits.get(scope["path"], self.max_body_bytes)
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() \
+                and int(content_length) > max_body_bytes:
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"Request body exceeds the {max_body_bytes} bytes limit"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # FastAPI re-raises HTTPException raised while parsing the body
+                    raise _too_large("Request body", max_body_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,8 @@
+import os
+
+# the in-process fake model: no API key or network needed
+os.environ.setdefault("GENAI_BACKEND", "fake")
+os.environ.setdefault("FAKE_GENAI_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_GENAI_LATENCY_DIST", "fixed")
+# uploads go to the model unchanged, without starting the preprocessing pool
+os.environ.setdefault("IMAGE_PREPROCESS", "0")
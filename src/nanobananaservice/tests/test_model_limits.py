@@ -0,0 +1,31 @@
+import io
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app
+from src.model_limits import model_limiter
+
+MODEL = "gemini-2.5-flash-image-preview"
+
+
+def png(color) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_streamed_remix_counts_as_completed():
+    before = model_limiter.stats().get(MODEL, {"completed": 0, "failed": 0})
+    client = TestClient(app.app)
+    response = client.post("/remix-images", data={"prompt": "Mix them.", "stream": "true"}, files={
+        "image1": ("a.png", png("red"), "image/png"),
+        "image2": ("b.png", png("blue"), "image/png"),
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+
+    stats = model_limiter.stats()[MODEL]
+    assert stats["completed"] == before["completed"] + 1
+    assert stats["failed"] == before["failed"]
+    assert stats["in_flight"] == 0
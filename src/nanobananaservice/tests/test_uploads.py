@@ -0,0 +1,19 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from src.uploads import MAX_REQUEST_BYTES
+
+ORIGIN = "http://frontend.example"
+
+
+@pytest.mark.parametrize("path", ["/describe-image", "/remix-images"])
+def test_oversized_content_length_413_has_cors_headers(path):
+    client = TestClient(app.app)
+    response = client.post(path, content=b"x", headers={
+        "Content-Length": str(MAX_REQUEST_BYTES + 1),
+        "Content-Type": "multipart/form-data; boundary=x",
+        "Origin": ORIGIN,
+    })
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == ORIGIN
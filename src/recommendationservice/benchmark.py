@@ -0,0 +1,90 @@
+#!/usr/bin/python
+#
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Micro-benchmark for the recommendation hot path. Runs offline, no
+# product catalog needed:
+#
+#   python benchmark.py
+
+import collections
+import random
+import time
+import timeit
+
+from product_index import ProductIndex
+from similarity import NeighborIndex
+
+MAX_RESPONSES = 5
+CART_SIZE = 3
+
+FakeProduct = collections.namedtuple('FakeProduct', ['id', 'description', 'categories'])
+CATEGORIES = ['accessories', 'clothing', 'tops', 'footwear', 'hair', 'beauty', 'decor', 'home', 'kitchen']
+WORDS = ('classic modern vintage leather cotton steel glass bamboo ceramic handmade soft durable '
+         'lightweight elegant casual summer winter minimal bold stylish cozy premium').split()
+
+
+def fake_catalog(size, rng):
+    return [FakeProduct(id="P{:09d}".format(i),
+                        description=" ".join(rng.choice(WORDS) for _ in range(12)),
+                        categories=rng.sample(CATEGORIES, rng.randint(1, 2)))
+            for i in range(size)]
+
+
+def legacy_sample(product_ids, cart):
+    filtered_products = list(set(product_ids)-set(cart))
+    num_products = len(filtered_products)
+    num_return = min(MAX_RESPONSES, num_products)
+    indices = random.sample(range(num_products), num_return)
+    return [filtered_products[i] for i in indices]
+
+
+def bench_sampling(sizes=(10, 1000, 100000)):
+    print("{:>8} {:>14} {:>14} {:>8}".format("products", "legacy us/op", "index us/op", "speedup"))
+    for size in sizes:
+        product_ids = ["P{:09d}".format(i) for i in range(size)]
+        index = ProductIndex(product_ids)
+        cart = random.sample(product_ids, min(CART_SIZE, size))
+        number = max(10, 200000 // size)
+
+        legacy = min(timeit.repeat(lambda: legacy_sample(product_ids, cart),
+                                   number=number, repeat=3)) / number
+        indexed = min(timeit.repeat(lambda: index.sample(MAX_RESPONSES, exclude=cart),
+                                    number=number, repeat=3)) / number
+        print("{:>8} {:>14.2f} {:>14.2f} {:>7.1f}x".format(
+            size, legacy * 1e6, indexed * 1e6, legacy / indexed))
+
+
+def bench_neighbor_index(sizes=(100, 1000, 10000, 20000)):
+    rng = random.Random(0)
+    print("{:>8} {:>12} {:>16}".format("products", "build ms", "recommend us/op"))
+    for size in sizes:
+        products = fake_catalog(size, rng)
+        index = ProductIndex(p.id for p in products)
+        start = time.perf_counter()
+        neighbors = NeighborIndex.build(products)
+        build = time.perf_counter() - start
+
+        cart = [p.id for p in rng.sample(products, CART_SIZE)]
+        number = 2000
+        lookup = min(timeit.repeat(lambda: neighbors.recommend(index, cart, MAX_RESPONSES),
+                                   number=number, repeat=3)) / number
+        print("{:>8} {:>12.1f} {:>16.2f}".format(size, build * 1e3, lookup * 1e6))
+
+
+if __name__ == "__main__":
+    bench_sampling()
+    print()
+    bench_neighbor_index()
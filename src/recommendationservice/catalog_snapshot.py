@@ -0,0 +1,192 @@
+#!/usr/bin/python
+#
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+
+import demo_pb2
+
+from logger import getJSONLogger
+from product_index import ProductIndex, unique_products
+from similarity import NeighborIndex
+logger = getJSONLogger('recommendationservice-server')
+
+
+class CatalogSnapshot(object):
+    """Immutable view of the product catalog at a given version."""
+
+    def __init__(self, version, products, fetched_at, neighbors_top_n=0):
+        self.version = version
+        # one entry per id, so neighbor rows line up with the index slots
+        unique = unique_products(products)
+        if len(unique) != len(products):
+            logger.warning("catalog has {} duplicate product ids; keeping the first of each".format(
+                len(products) - len(unique)))
+        self.products = unique
+        self.index = ProductIndex(x.id for x in unique)
+        self.product_ids = self.index.ids
+        self.fetched_at = fetched_at
+        # neighbor table for the "similarity" strategy, built only when asked for
+        self.neighbors = None
+        if neighbors_top_n > 0:
+            self.neighbors = NeighborIndex.build(unique, top_n=neighbors_top_n)
+
+
+class CatalogCache(object):
+    """Holds the latest catalog snapshot and refreshes it in the background.
+
+    Readers always get the current snapshot without touching the network.
+    A failed refresh keeps serving the previous (stale) snapshot until the
+    catalog becomes reachable again.
+    """
+
+    def __init__(self, stub, ttl_seconds=60, timeout_seconds=5, neighbors_top_n=0):
+        self._stub = stub
+        self._ttl = ttl_seconds
+        self._timeout = timeout_seconds
+        self._neighbors_top_n = neighbors_top_n
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_latency = 0.0
+        self.total_refresh_latency = 0.0
+
+    def get(self):
+        """Returns the current snapshot, fetching synchronously only if none exists yet."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return self.refresh()
+
+    def refresh(self):
+        """Fetches the catalog and installs a new snapshot.
+
+        On error the previous snapshot is returned (stale-while-revalidate);
+        the error is only raised if there is nothing to fall back to.
+        """
+        start = time.time()
+        try:
+            response = self._stub.ListProducts(demo_pb2.Empty(), timeout=self._timeout)
+        except Exception as e:
+            return self._fallback(e)
+        return self._install(list(response.products), time.time() - start)
+
+    def _fallback(self, error):
+        self.refresh_errors += 1
+        if self._snapshot is None:
+            raise error
+        logger.warning("catalog refresh failed, serving snapshot v{}: {}".format(
+            self._snapshot.version, error))
+        return self._snapshot
+
+    def _install(self, products, latency):
+        # indexes are built outside the lock, readers keep the old snapshot meanwhile
+        snapshot = CatalogSnapshot(0, products, time.time(), self._neighbors_top_n)
+        with self._lock:
+            snapshot.version = self._snapshot.version + 1 if self._snapshot else 1
+            self._snapshot = snapshot
+            self.refreshes += 1
+            self.last_refresh_latency = latency
+            self.total_refresh_latency += latency
+        return snapshot
+
+    def start(self):
+        """Primes the cache and starts the background refresh thread."""
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("initial catalog fetch failed: {}".format(e))
+        self._thread = threading.Thread(target=self._run, name='catalog-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._ttl):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("catalog refresh failed: {}".format(e))
+            logger.info("catalog cache stats: {}".format(self.stats()))
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else 0,
+            'products': len(snapshot.product_ids) if snapshot else 0,
+            'age_seconds': round(time.time() - snapshot.fetched_at, 3) if snapshot else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'last_refresh_latency_ms': round(self.last_refresh_latency * 1000, 3),
+            'avg_refresh_latency_ms': round(
+                self.total_refresh_latency * 1000 / self.refreshes, 3) if self.refreshes else 0.0,
+        }
+
+
+class AsyncCatalogCache(CatalogCache):
+    """CatalogCache for grpc.aio: uses an async stub and an asyncio refresh task."""
+
+    def __init__(self, stub, ttl_seconds=60, timeout_seconds=5, neighbors_top_n=0):
+        super(AsyncCatalogCache, self).__init__(stub, ttl_seconds, timeout_seconds, neighbors_top_n)
+        self._task = None
+
+    async def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return await self.refresh()
+
+    async def refresh(self):
+        start = time.time()
+        try:
+            response = await self._stub.ListProducts(demo_pb2.Empty(), timeout=self._timeout)
+        except Exception as e:
+            return self._fallback(e)
+        # building the indexes is CPU bound, keep it off the event loop
+        return await asyncio.to_thread(self._install, list(response.products), time.time() - start)
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("initial catalog fetch failed: {}".format(e))
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("catalog refresh failed: {}".format(e))
+            logger.info("catalog cache stats: {}".format(self.stats()))
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+#
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+
+def unique_products(products):
+    """Returns the products with the first entry of every id, in catalog order."""
+    seen = set()
+    unique = []
+    for product in products:
+        if product.id not in seen:
+            seen.add(product.id)
+            unique.append(product)
+    return unique
+
+
+class ProductIndex(object):
+    """Dense array of product ids plus an id -> slot map.
+
+    Built once per catalog snapshot so that sampling never has to copy
+    or rebuild sets over the whole catalog.
+    """
+
+    def __init__(self, product_ids):
+        self.ids = []
+        self.slots = {}
+        for product_id in product_ids:
+            if product_id not in self.slots:
+                self.slots[product_id] = len(self.ids)
+                self.ids.append(product_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sample(self, k, exclude=(), rng=random):
+        """Returns up to k distinct ids uniformly at random, skipping `exclude`.
+
+        Runs a partial Fisher-Yates shuffle over the slot range, keeping the
+        swapped slots in a sparse dict, and rejects excluded slots as they
+        come up. Each rejection permanently removes one excluded slot, so the
+        number of draws is bounded by k + |exclude|.
+        """
+        n = len(self.ids)
+        excluded = set()
+        for product_id in exclude:
+            slot = self.slots.get(product_id)
+            if slot is not None:
+                excluded.add(slot)
+        k = min(k, n - len(excluded))
+        if k <= 0:
+            return []
+
+        result = []
+        swapped = {}
+        i = 0
+        while len(result) < k:
+            j = rng.randrange(i, n)
+            picked = swapped.get(j, j)
+            swapped[j] = swapped.get(i, i)
+            i += 1
+            if picked not in excluded:
+                result.append(self.ids[picked])
+        return result
@@ -14,8 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
-import random
 import time
 import traceback
 from concurrent import futures
@@ -31,10 +31,12 @@ from grpc_health.v1 import health_pb2_grpc
 
 from opentelemetry import trace
 from opentelemetry.instrumentation.grpc import GrpcInstrumentorClient, GrpcInstrumentorServer
+from opentelemetry.instrumentation.grpc import GrpcAioInstrumentorClient, GrpcAioInstrumentorServer
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 
+from catalog_snapshot import AsyncCatalogCache, CatalogCache
 from logger import getJSONLogger
 logger = getJSONLogger('recommendationservice-server')
 
@@ -65,17 +67,17 @@ def initStackdriverProfiling():
 
 class RecommendationService(demo_pb2_grpc.RecommendationServiceServicer):
     def ListRecommendations(self, request, context):
+        return self.recommend(catalog_cache.get(), request)
+
+    def recommend(self, snapshot, request):
         max_responses = 5
-        # fetch list of products from product catalog stub
-        cat_response = product_catalog_stub.ListProducts(demo_pb2.Empty())
-        product_ids = [x.id for x in cat_response.products]
-        filtered_products = list(set(product_ids)-set(request.product_ids))
-        num_products = len(filtered_products)
-        num_return = min(max_responses, num_products)
-        # sample list of indicies to return
-        indices = random.sample(range(num_products), num_return)
-        # fetch product ids from indices
-        prod_list = [filtered_products[i] for i in indices]
+        if snapshot.neighbors is not None:
+            # "similarity": merge precomputed neighbors of the user's products
+            prod_list = snapshot.neighbors.recommend(snapshot.index, request.product_ids, max_responses)
+        else:
+            # "random": sample product ids from the cached catalog snapshot,
+            # skipping the products the user already has
+            prod_list = snapshot.index.sample(max_responses, exclude=request.product_ids)
         logger.info("[Recv ListRecommendations] product_ids={}".format(prod_list))
         # build and return response
         response = demo_pb2.ListRecommendationsResponse()
@@ -90,6 +92,75 @@ class RecommendationService(demo_pb2_grpc.RecommendationServiceServicer):
         return health_pb2.HealthCheckResponse(
             status=health_pb2.HealthCheckResponse.UNIMPLEMENTED)
 
+class AsyncRecommendationService(RecommendationService):
+    """grpc.aio flavour of RecommendationService, same responses."""
+
+    async def ListRecommendations(self, request, context):
+        return self.recommend(await catalog_cache.get(), request)
+
+    async def Check(self, request, context):
+        return RecommendationService.Check(self, request, context)
+
+    async def Watch(self, request, context):
+        return RecommendationService.Watch(self, request, context)
+
+def serve(port, catalog_addr, catalog_ttl, neighbors_top_n):
+    global catalog_cache
+
+    channel = grpc.insecure_channel(catalog_addr)
+    product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(channel)
+
+    # keep a snapshot of the catalog refreshed in the background
+    catalog_cache = CatalogCache(product_catalog_stub, ttl_seconds=catalog_ttl,
+                                 neighbors_top_n=neighbors_top_n)
+    catalog_cache.start()
+
+    # create gRPC server
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+
+    # add class to gRPC server
+    service = RecommendationService()
+    demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
+    health_pb2_grpc.add_HealthServicer_to_server(service, server)
+
+    # start server
+    logger.info("listening on port: " + port)
+    server.add_insecure_port('[::]:'+port)
+    server.start()
+
+    # keep alive
+    try:
+         while True:
+            time.sleep(10000)
+    except KeyboardInterrupt:
+            catalog_cache.stop()
+            server.stop(0)
+
+async def serve_async(port, catalog_addr, catalog_ttl, neighbors_top_n):
+    global catalog_cache
+
+    channel = grpc.aio.insecure_channel(catalog_addr)
+    product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(channel)
+
+    catalog_cache = AsyncCatalogCache(product_catalog_stub, ttl_seconds=catalog_ttl,
+                                      neighbors_top_n=neighbors_top_n)
+    await catalog_cache.start()
+
+    server = grpc.aio.server()
+    service = AsyncRecommendationService()
+    demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
+    health_pb2_grpc.add_HealthServicer_to_server(service, server)
+
+    logger.info("listening on port: " + port + " (async)")
+    server.add_insecure_port('[::]:'+port)
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        catalog_cache.stop()
+        await server.stop(0)
+        await channel.close()
+
 
 if __name__ == "__main__":
     logger.info("initializing recommendationservice")
@@ -103,10 +174,17 @@ if __name__ == "__main__":
     except KeyError:
         logger.info("Profiler disabled.")
 
+    # "sync" (thread pool) or "async" (grpc.aio)
+    server_mode = os.environ.get('GRPC_SERVER_MODE', "sync")
+
     try:
-      grpc_client_instrumentor = GrpcInstrumentorClient()
+      if server_mode == "async":
+        grpc_client_instrumentor = GrpcAioInstrumentorClient()
+        grpc_server_instrumentor = GrpcAioInstrumentorServer()
+      else:
+        grpc_client_instrumentor = GrpcInstrumentorClient()
+        grpc_server_instrumentor = GrpcInstrumentorServer()
       grpc_client_instrumentor.instrument()
-      grpc_server_instrumentor = GrpcInstrumentorServer()
       grpc_server_instrumentor.instrument()
       if os.environ["ENABLE_TRACING"] == "1":
         trace.set_tracer_provider(TracerProvider())
@@ -129,25 +207,19 @@ if __name__ == "__main__":
     if catalog_addr == "":
         raise Exception('PRODUCT_CATALOG_SERVICE_ADDR environment variable not set')
     logger.info("product catalog address: " + catalog_addr)
-    channel = grpc.insecure_channel(catalog_addr)
-    product_catalog_stub = demo_pb2_grpc.ProductCatalogServiceStub(channel)
-
-    # create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-
-    # add class to gRPC server
-    service = RecommendationService()
-    demo_pb2_grpc.add_RecommendationServiceServicer_to_server(service, server)
-    health_pb2_grpc.add_HealthServicer_to_server(service, server)
-
-    # start server
-    logger.info("listening on port: " + port)
-    server.add_insecure_port('[::]:'+port)
-    server.start()
-
-    # keep alive
-    try:
-         while True:
-            time.sleep(10000)
-    except KeyboardInterrupt:
-            server.stop(0)
+    catalog_ttl = int(os.environ.get('CATALOG_REFRESH_INTERVAL', "60"))
+
+    # "random" (uniform sampling) or "similarity" (precomputed neighbor table)
+    strategy = os.environ.get('RECOMMENDATION_STRATEGY', "random")
+    neighbors_top_n = 0
+    if strategy == "similarity":
+        neighbors_top_n = int(os.environ.get('SIMILARITY_TOP_N', "10"))
+    logger.info("recommendation strategy: " + strategy)
+
+    if server_mode == "async":
+        try:
+            asyncio.run(serve_async(port, catalog_addr, catalog_ttl, neighbors_top_n))
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve(port, catalog_addr, catalog_ttl, neighbors_top_n)
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+#
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import zlib
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that
+the this to with you your
+""".split())
+
+
+def _tokens(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def _description_vectors(descriptions, dims):
+    """Hashed TF-IDF vectors, one L2-normalised row per description."""
+    tf = np.zeros((len(descriptions), dims), dtype=np.float32)
+    for row, text in enumerate(descriptions):
+        for token in _tokens(text):
+            tf[row, zlib.crc32(token.encode()) % dims] += 1.0
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1.0 + len(descriptions)) / (1.0 + df)) + 1.0
+    vectors = tf * idf.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _category_matrix(categories):
+    vocab = {}
+    for cats in categories:
+        for c in cats:
+            vocab.setdefault(c, len(vocab))
+    matrix = np.zeros((len(categories), max(len(vocab), 1)), dtype=np.float32)
+    for row, cats in enumerate(categories):
+        for c in cats:
+            matrix[row, vocab[c]] = 1.0
+    return matrix
+
+
+class NeighborIndex(object):
+    """Top-N most similar products for every product in a catalog snapshot.
+
+    Similarity is a weighted sum of category Jaccard and cosine similarity
+    of hashed TF-IDF description vectors. The table is built once per
+    snapshot; lookups at request time only walk precomputed rows.
+    """
+
+    def __init__(self, neighbors):
+        # neighbors[slot] is an array of neighbor slots, best first, -1 padded
+        self.neighbors = neighbors
+
+    @classmethod
+    def build(cls, products, top_n=10, category_weight=0.5, dims=512, block_size=1024):
+        n = len(products)
+        top_n = max(0, min(top_n, n - 1))
+        neighbors = np.full((n, top_n), -1, dtype=np.int32)
+        if top_n == 0:
+            return cls(neighbors)
+
+        text = _description_vectors([p.description for p in products], dims)
+        cats = _category_matrix([list(p.categories) for p in products])
+        cat_counts = cats.sum(axis=1)
+
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            cosine = text[start:stop] @ text.T
+            inter = cats[start:stop] @ cats.T
+            union = cat_counts[start:stop, None] + cat_counts[None, :] - inter
+            jaccard = inter / np.maximum(union, 1.0)
+            scores = category_weight * jaccard + (1.0 - category_weight) * cosine
+            rows = np.arange(stop - start)
+            scores[rows, rows + start] = -np.inf
+
+            top = np.argpartition(scores, -top_n, axis=1)[:, -top_n:]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            neighbors[start:stop] = np.where(top_scores > 0, top, -1)
+        return cls(neighbors)
+
+    def recommend(self, index, product_ids, k):
+        """Returns up to k ids similar to `product_ids`, excluding them.
+
+        Neighbor lists of the given products are merged rank by rank; if
+        they run short (empty cart, unknown ids) the rest is filled with a
+        uniform sample from `index`.
+        """
+        exclude = set(product_ids)
+        rows = [self.neighbors[index.slots[p]] for p in exclude if p in index.slots]
+        result = []
+        seen = set()
+        for rank in range(self.neighbors.shape[1]):
+            for row in rows:
+                slot = int(row[rank])
+                if slot < 0:
+                    continue
+                product_id = index.ids[slot]
+                if product_id in exclude or product_id in seen:
+                    continue
+                seen.add(product_id)
+                result.append(product_id)
+                if len(result) == k:
+                    return result
+        if len(result) < k:
+            exclude.update(result)
+            result.extend(index.sample(k - len(result), exclude=exclude))
+        return result
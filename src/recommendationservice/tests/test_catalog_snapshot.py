@@ -0,0 +1,27 @@
+import demo_pb2
+
+from catalog_snapshot import CatalogSnapshot
+
+
+def product(product_id, description, *categories):
+    return demo_pb2.Product(id=product_id, name=product_id, description=description,
+                            categories=list(categories))
+
+
+def test_duplicate_id_keeps_neighbors_aligned_with_index():
+    products = [
+        product("A", "aviator sunglasses for summer", "accessories"),
+        # duplicate id with unrelated content
+        product("A", "ceramic coffee mug", "kitchen"),
+        product("B", "ceramic coffee mug for the kitchen", "kitchen"),
+        product("C", "round sunglasses for summer", "accessories"),
+        product("D", "ceramic mug and coffee jar", "kitchen"),
+    ]
+    snapshot = CatalogSnapshot(1, products, 0.0, neighbors_top_n=3)
+
+    assert snapshot.product_ids == ["A", "B", "C", "D"]
+    assert [p.description for p in snapshot.products][0] == "aviator sunglasses for summer"
+    assert snapshot.neighbors.neighbors.shape[0] == len(snapshot.index)
+    assert snapshot.neighbors.recommend(snapshot.index, ["C"], 1) == ["A"]
+    assert snapshot.neighbors.recommend(snapshot.index, ["A"], 1) == ["C"]
+    assert snapshot.neighbors.recommend(snapshot.index, ["B"], 1) == ["D"]
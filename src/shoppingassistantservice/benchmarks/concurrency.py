@@ -0,0 +1,101 @@
+"""
+Throughput and latency of the shopping assistant under concurrent
+conversations, served by Flask (threaded, like app.run) and by the ASGI
+app (uvicorn, one thread), against a local Postgres with pgvector.
+
+The Gemini calls are faked with fixed latencies (VISION_MS, ANSWER_MS,
+EMBED_MS); the similarity search runs for real on a products table built
+from the catalog (see benchmarks/standin.py for PG_URL). Run from
+src/shoppingassistantservice:
+
+    python -m benchmarks.concurrency
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+from langchain_google_alloydb_pg import AlloyDBEngine, AlloyDBVectorStore
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import shoppingassistantservice as service
+from benchmarks.standin import (PG_URL, TABLE, VECTOR_SIZE, FakeChatModel, FakeEmbeddings,
+                                FlaskServer, UvicornServer, create_catalog_table, percentile)
+
+VISION_MS = 500
+EMBED_MS = 100
+ANSWER_MS = 1000
+CONCURRENCY = [1, 8, 32, 64]
+ROUNDS = 2
+FLASK_PORT = 8091
+ASGI_PORT = 8092
+BODY = {"message": "I need a lamp for my living room", "image": "https://example.com/room.jpg"}
+
+
+def fake_models():
+    return FakeChatModel(latency_ms=VISION_MS), FakeChatModel(latency_ms=ANSWER_MS)
+
+
+def flask_assistant():
+    engine = AlloyDBEngine.from_connection_string(PG_URL)
+    vectorstore = AlloyDBVectorStore.create_sync(
+        engine=engine, table_name=TABLE,
+        embedding_service=FakeEmbeddings(size=VECTOR_SIZE, latency_ms=EMBED_MS),
+        **service.VECTORSTORE_COLUMNS)
+    return service.ShoppingAssistant(vectorstore, *fake_models())
+
+
+async def asgi_assistant():
+    # no background loop: the queries run on uvicorn's event loop
+    engine = AlloyDBEngine.from_engine(create_async_engine(PG_URL))
+    vectorstore = await AlloyDBVectorStore.create(
+        engine=engine, table_name=TABLE,
+        embedding_service=FakeEmbeddings(size=VECTOR_SIZE, latency_ms=EMBED_MS),
+        **service.VECTORSTORE_COLUMNS)
+    return service.ShoppingAssistant(vectorstore, *fake_models())
+
+
+async def run_level(port, concurrency):
+    latencies = []
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    async def conversation(client):
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            response = await client.post("/", json=BODY)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+        sampler = asyncio.create_task(sample_threads())
+        start = time.perf_counter()
+        await asyncio.gather(*(conversation(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await sampler
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 95), peak_threads
+
+
+def report(name, port):
+    for concurrency in CONCURRENCY:
+        throughput, p50, p95, threads = asyncio.run(run_level(port, concurrency))
+        print(f"{name:<6} c={concurrency:<3} {throughput:6.1f} req/s  p50={p50:7.0f} ms  "
+              f"p95={p95:7.0f} ms  peak threads={threads}")
+
+
+if __name__ == "__main__":
+    rows = asyncio.run(create_catalog_table())
+    print(f"{rows} products, fake latencies: vision {VISION_MS} ms, embedding {EMBED_MS} ms, "
+          f"answer {ANSWER_MS} ms ({VISION_MS + EMBED_MS + ANSWER_MS} ms per request)")
+    with FlaskServer(service.create_app(flask_assistant()), FLASK_PORT):
+        report("flask", FLASK_PORT)
+    with UvicornServer(service.create_asgi_app(asgi_assistant), ASGI_PORT):
+        report("asgi", ASGI_PORT)
@@ -0,0 +1,96 @@
+"""
+Size of the final design prompt with the old product context (the LangChain
+serialization of every retrieved document) and the compact product table,
+for documents retrieved from a local Postgres with pgvector (see
+benchmarks/standin.py for PG_URL).
+
+Tokens are estimated (about 4 characters per token). With GOOGLE_API_KEY
+set, Gemini also counts the tokens and the final call is timed for both
+prompts. Run from src/shoppingassistantservice:
+
+    python -m benchmarks.context
+"""
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from langchain_google_alloydb_pg import AlloyDBEngine, AlloyDBVectorStore
+
+import shoppingassistantservice as service
+from benchmarks.standin import PG_URL, TABLE, VECTOR_SIZE, FakeEmbeddings, create_catalog_table
+from context import build_context, estimate_tokens
+
+K = [4, 8, 16]
+RUNS = 5
+PROMPT = "I need something to brighten up the dining table"
+DESCRIPTION = (
+    "This is a bright Scandinavian dining room. Light oak floors and white walls keep it airy, and a "
+    "long solid wood table is surrounded by black spindle chairs. Linen curtains filter the daylight, "
+    "a paper pendant lamp hangs over the table and a few ceramic vases and plants add texture. The "
+    "palette is neutral, with natural materials, soft textiles and a minimal, uncluttered feel.")
+
+
+def new_context(docs):
+    return build_context(docs, service.CONTEXT_TOKEN_BUDGET, service.CONTEXT_DESCRIPTION_CHARS,
+                         service.CONTEXT_DEDUPE_THRESHOLD)
+
+
+def design_prompt(relevant_docs):
+    # build_design_prompt prints the prompt
+    with contextlib.redirect_stdout(io.StringIO()):
+        return service.build_design_prompt(PROMPT, DESCRIPTION, relevant_docs)
+
+
+def old_context(docs):
+    relevant_docs = ""
+    for doc in docs:
+        relevant_docs += str(doc.to_json()) + ", "
+    return relevant_docs
+
+
+def time_build(build, docs):
+    start = time.perf_counter()
+    for _ in range(1000):
+        build(docs)
+    return (time.perf_counter() - start) * 1000
+
+
+def gemini_call(llm, prompt):
+    latencies = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        llm.invoke(prompt)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+if __name__ == "__main__":
+    asyncio.run(create_catalog_table(copies=3))
+    engine = AlloyDBEngine.from_connection_string(PG_URL)
+    vectorstore = AlloyDBVectorStore.create_sync(engine=engine, table_name=TABLE,
+                                                 embedding_service=FakeEmbeddings(size=VECTOR_SIZE),
+                                                 **service.VECTORSTORE_COLUMNS)
+    llm = None
+    if os.getenv("GOOGLE_API_KEY"):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+
+    query = service.vector_search_prompt_for(PROMPT, DESCRIPTION)
+    for k in K:
+        docs = vectorstore.similarity_search(query, k=k)
+        table, stats = new_context(docs)
+        before, after = design_prompt(old_context(docs)), design_prompt(table)
+        print(f"k={k:<3} context: before {estimate_tokens(old_context(docs)):5} tokens, after {stats['tokens']:4} "
+              f"tokens ({stats['products']} products, {stats['duplicates']} duplicates, "
+              f"{stats['over_budget']} over budget)  |  prompt: before {estimate_tokens(before):5} tokens, "
+              f"after {estimate_tokens(after):4} tokens  |  build x1000: before "
+              f"{time_build(old_context, docs):5.0f} ms, after {time_build(new_context, docs):5.0f} ms")
+        if llm is not None:
+            print(f"      Gemini tokens: before {llm.get_num_tokens(before)}, after {llm.get_num_tokens(after)}  |  "
+                  f"final call median: before {gemini_call(llm, before):7.0f} ms, "
+                  f"after {gemini_call(llm, after):7.0f} ms")
+    print()
+    print(new_context(vectorstore.similarity_search(query, k=8))[0])
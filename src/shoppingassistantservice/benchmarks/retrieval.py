@@ -0,0 +1,90 @@
+"""
+Similarity search latency with the query embedding and result caches, and
+with a category filter pushed down into SQL, against a local Postgres with
+pgvector (see benchmarks/standin.py for PG_URL).
+
+The embedding service is faked with a fixed latency (EMBED_MS); the search
+runs for real on COPIES copies of the catalog. Run from
+src/shoppingassistantservice:
+
+    python -m benchmarks.retrieval
+"""
+import asyncio
+import statistics
+import time
+
+from langchain_google_alloydb_pg import AlloyDBEngine, AlloyDBVectorStore
+
+import shoppingassistantservice as service
+from benchmarks.standin import (PG_URL, TABLE, VECTOR_SIZE, FakeChatModel, FakeEmbeddings,
+                                create_catalog_table)
+from caches import EmbeddingCache, TTLCache
+
+EMBED_MS = 150
+COPIES = 2000
+RUNS = 20
+QUERIES = [
+    " This is the user's request: {} Find the most relevant items for that prompt, while matching style "
+    "of the room described here: A bright Scandinavian living room with light oak floors, white walls, "
+    "a grey linen sofa and plenty of plants. ".format(request)
+    for request in ["I need a lamp", "Something to put flowers in", "A nice mug for coffee",
+                    "Decorate the table", "Kitchen gear for a dinner party"]
+]
+
+
+def timed(assistant, query, categories):
+    start = time.perf_counter()
+    docs = assistant.search(query, categories)
+    return (time.perf_counter() - start) * 1000, docs
+
+
+def measure(name, assistant, categories=(), reset=None):
+    latencies = []
+    for i in range(RUNS):
+        if reset:
+            reset(assistant)
+        elapsed, docs = timed(assistant, QUERIES[i % len(QUERIES)], categories)
+        latencies.append(elapsed)
+    print(f"{name:<44} mean={statistics.mean(latencies):8.2f} ms  "
+          f"median={statistics.median(latencies):8.2f} ms")
+    return docs
+
+
+def reset_all(assistant):
+    assistant.query_embeddings.exact = TTLCache(2048, 3600)
+    assistant.search_results = TTLCache(512, 60)
+
+
+def reset_results(assistant):
+    assistant.search_results = TTLCache(512, 60)
+
+
+if __name__ == "__main__":
+    rows = asyncio.run(create_catalog_table(COPIES))
+    engine = AlloyDBEngine.from_connection_string(PG_URL)
+    embeddings = FakeEmbeddings(size=VECTOR_SIZE, latency_ms=EMBED_MS)
+    vectorstore = AlloyDBVectorStore.create_sync(engine=engine, table_name=TABLE, embedding_service=embeddings,
+                                                 **service.VECTORSTORE_COLUMNS)
+    assistant = service.ShoppingAssistant(vectorstore, FakeChatModel(), FakeChatModel())
+    print(f"{rows} products, fake embedding latency {EMBED_MS} ms, k={service.RETRIEVAL_K}, "
+          f"{len(QUERIES)} queries x {RUNS // len(QUERIES)}")
+
+    measure("no cache", assistant, reset=reset_all)
+    measure("embedding cached, results expired", assistant, reset=reset_results)
+    for query in QUERIES:
+        assistant.search(query, ())
+    measure("embedding and results cached", assistant)
+
+    docs = measure("no cache, categories=kitchen", assistant, ["kitchen"], reset=reset_all)
+    assert all("kitchen" in doc.metadata["categories"].split(",") for doc in docs)
+    docs = measure("no cache, categories=home", assistant, ["home"], reset=reset_all)
+    assert all("home" in doc.metadata["categories"].split(",") for doc in docs)
+
+    # near-duplicate tier: the same request with a different wording
+    assistant.query_embeddings = EmbeddingCache(embeddings, 2048, 3600, near_threshold=0.9)
+    assistant.search_results = TTLCache(512, 60)
+    calls = embeddings.calls
+    assistant.search(QUERIES[0], ())
+    elapsed, _ = timed(assistant, QUERIES[0].replace("I need a lamp", "I need a lamp please"), ())
+    print(f"{'near-duplicate query (threshold 0.9)':<44} {elapsed:7.1f} ms  "
+          f"embedding calls {embeddings.calls - calls}  {assistant.query_embeddings.stats()}")
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, FrozenSet, Hashable, List, Optional, Tuple
+
+
+def image_key(image) -> str:
+    """SHA-256 of the `image` payload of a request: a data URL, a URL, or an image_url dict."""
+    if not isinstance(image, str):
+        image = json.dumps(image, sort_keys=True)
+    return hashlib.sha256(image.encode("utf-8")).hexdigest()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def vector_key(vector: List[float]) -> str:
+    return hashlib.sha256(array("d", vector).tobytes()).hexdigest()
+
+
+def _tokens(text: str) -> FrozenSet[str]:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl_seconds` after they are
+    stored. Holds at most `max_entries` entries; 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingCache:
+    """
+    Query embeddings by exact text, with an optional near-duplicate tier.
+
+    With `near_threshold` > 0, a query whose word set has a Jaccard
+    similarity of at least `near_threshold` with one of the last
+    `near_scan` embedded queries reuses that query's embedding. The search
+    prompts embed a long room description, so queries that differ by a few
+    words are already very similar: keep the threshold high.
+    """
+
+    def __init__(self, embeddings, max_entries: int, ttl_seconds: float,
+                 near_threshold: float = 0.0, near_scan: int = 256):
+        self.embeddings = embeddings
+        self.exact = TTLCache(max_entries, ttl_seconds)
+        self.near_threshold = near_threshold
+        self.near_scan = near_scan
+        # text key -> (expires_at, words, embedding), newest last
+        self._recent: "OrderedDict[str, Tuple[float, FrozenSet[str], List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.near_hits = 0
+
+    def _near(self, words: FrozenSet[str]) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            for key in reversed(self._recent):
+                expires_at, other, embedding = self._recent[key]
+                if expires_at < now or not words or not other:
+                    continue
+                if len(words & other) / len(words | other) >= self.near_threshold:
+                    self.near_hits += 1
+                    return embedding
+        return None
+
+    def _lookup(self, text: str) -> Tuple[str, Optional[List[float]]]:
+        key = text_key(text)
+        embedding = self.exact.get(key)
+        if embedding is None and self.near_threshold > 0:
+            embedding = self._near(_tokens(text))
+            if embedding is not None:
+                self.exact.set(key, embedding)
+        return key, embedding
+
+    def _store(self, key: str, text: str, embedding: List[float]) -> None:
+        self.exact.set(key, embedding)
+        if self.near_threshold > 0:
+            with self._lock:
+                self._recent[key] = (time.time() + self.exact.ttl, _tokens(text), embedding)
+                self._recent.move_to_end(key)
+                while len(self._recent) > self.near_scan:
+                    self._recent.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key, embedding = self._lookup(text)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(text)
+            self._store(key, text, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key, embedding = self._lookup(text)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(text)
+            self._store(key, text, embedding)
+        return embedding
+
+    def stats(self) -> dict:
+        return {**self.exact.stats(), "near_hits": self.near_hits}
@@ -0,0 +1,86 @@
+import math
+import re
+from typing import List, Tuple
+
+COLUMNS = ("id", "name", "categories", "description")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about 4 characters per token), without a call to the API."""
+    return math.ceil(len(text) / 4)
+
+
+def trim(text: str, max_chars: int) -> str:
+    """Cuts `text` at the last word boundary before `max_chars`."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(",.;:") + "…"
+
+
+def _cell(value) -> str:
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
+def _base_name(name: str) -> str:
+    # "Candle Holder", "candle holder " and "Candle Holder (2)" are the same product to the model
+    return " ".join(re.findall(r"[a-z]+", name.lower()))
+
+
+def _near_duplicate(a: dict, b: dict, threshold: float) -> bool:
+    if _base_name(a["name"]) != _base_name(b["name"]):
+        return False
+    words_a, words_b = _words(a["description"]), _words(b["description"])
+    if not words_a or not words_b:
+        return words_a == words_b
+    return len(words_a & words_b) / len(words_a | words_b) >= threshold
+
+
+def build_context(docs, token_budget: int, description_chars: int,
+                  dedupe_threshold: float = 0.9) -> Tuple[str, dict]:
+    """
+    Compact product table for the design prompt: one `id | name | categories
+    | description` row per retrieved document, in retrieval order, with the
+    description trimmed to `description_chars`.
+
+    A product with the same name as an earlier one and a description whose
+    word set overlaps it by at least `dedupe_threshold` is dropped. Rows stop
+    once the table would exceed `token_budget` (estimated) tokens; the first
+    row is always kept. Returns the table and counts of what was kept.
+    """
+    rows: List[dict] = []
+    duplicates = 0
+    for doc in docs:
+        row = {
+            "id": doc.metadata.get("id", doc.id),
+            "name": doc.metadata.get("name", ""),
+            "categories": doc.metadata.get("categories", ""),
+            "description": doc.page_content,
+        }
+        if any(_near_duplicate(row, kept, dedupe_threshold) for kept in rows):
+            duplicates += 1
+            continue
+        rows.append(row)
+
+    lines = [" | ".join(COLUMNS)]
+    tokens = estimate_tokens(lines[0])
+    for row in rows:
+        line = " | ".join([_cell(row["id"]), _cell(row["name"]), _cell(row["categories"]),
+                           _cell(trim(row["description"], description_chars))])
+        line_tokens = estimate_tokens(line) + 1
+        if len(lines) > 1 and tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+
+    return "\n".join(lines), {
+        "products": len(lines) - 1,
+        "duplicates": duplicates,
+        "over_budget": len(rows) - (len(lines) - 1),
+        "tokens": tokens,
+    }
@@ -14,107 +14,425 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import os
+import re
+import time
+from contextlib import asynccontextmanager
 
 from google.cloud import secretmanager_v1
 from urllib.parse import unquote
 from langchain_core.messages import HumanMessage
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from flask import Flask, request
+from flask import Flask, Response, request, stream_with_context
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 from langchain_google_alloydb_pg import AlloyDBEngine, AlloyDBVectorStore
 
-PROJECT_ID = os.environ["PROJECT_ID"]
-REGION = os.environ["REGION"]
-ALLOYDB_DATABASE_NAME = os.environ["ALLOYDB_DATABASE_NAME"]
-ALLOYDB_TABLE_NAME = os.environ["ALLOYDB_TABLE_NAME"]
-ALLOYDB_CLUSTER_NAME = os.environ["ALLOYDB_CLUSTER_NAME"]
-ALLOYDB_INSTANCE_NAME = os.environ["ALLOYDB_INSTANCE_NAME"]
-ALLOYDB_SECRET_NAME = os.environ["ALLOYDB_SECRET_NAME"]
-
-secret_manager_client = secretmanager_v1.SecretManagerServiceClient()
-secret_name = secret_manager_client.secret_version_path(project=PROJECT_ID, secret=ALLOYDB_SECRET_NAME, secret_version="latest")
-secret_request = secretmanager_v1.AccessSecretVersionRequest(name=secret_name)
-secret_response = secret_manager_client.access_secret_version(request=secret_request)
-PGPASSWORD = secret_response.payload.data.decode("UTF-8").strip()
-
-engine = AlloyDBEngine.from_instance(
-    project_id=PROJECT_ID,
-    region=REGION,
-    cluster=ALLOYDB_CLUSTER_NAME,
-    instance=ALLOYDB_INSTANCE_NAME,
-    database=ALLOYDB_DATABASE_NAME,
-    user="postgres",
-    password=PGPASSWORD
-)
+from caches import EmbeddingCache, TTLCache, image_key, vector_key
+from context import build_context
+
+# "flask" (WSGI, one thread per request) or "asgi" (uvicorn, async RAG steps)
+SERVING_MODE = os.getenv("SERVING_MODE", "flask")
+
+# Room descriptions, keyed by a hash of the image payload
+ROOM_CACHE_MAX_ENTRIES = int(os.getenv("ROOM_CACHE_MAX_ENTRIES", "256"))
+ROOM_CACHE_TTL_SECONDS = float(os.getenv("ROOM_CACHE_TTL_SECONDS", "1800"))
 
-# Create a synchronous connection to our vectorstore
-vectorstore = AlloyDBVectorStore.create_sync(
-    engine=engine,
-    table_name=ALLOYDB_TABLE_NAME,
-    embedding_service=GoogleGenerativeAIEmbeddings(model="models/embedding-001"),
+# Similarity search: documents per query and default category filter
+# (comma-separated, empty for the whole catalog)
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_CATEGORIES = [c.strip().lower() for c in os.getenv("RETRIEVAL_CATEGORIES", "").split(",") if c.strip()]
+# Query embeddings by exact text, and optionally by word overlap (0 disables)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_CACHE_NEAR_THRESHOLD = float(os.getenv("EMBEDDING_CACHE_NEAR_THRESHOLD", "0"))
+# Top-k documents per (query embedding, k, filter), kept shortly so catalog updates show up
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+
+# Product table given to the final prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_DESCRIPTION_CHARS = int(os.getenv("CONTEXT_DESCRIPTION_CHARS", "240"))
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.9"))
+
+# Columns of the products table used by the vectorstore
+VECTORSTORE_COLUMNS = dict(
     id_column="id",
     content_column="description",
     embedding_column="product_embedding",
     metadata_columns=["id", "name", "categories"]
 )
 
-def create_app():
-    app = Flask(__name__)
+ROOM_DESCRIPTION_PROMPT = "You are a professional interior designer, give me a detailed decsription of the style of the room in this image"
+
+
+def alloydb_settings():
+    PROJECT_ID = os.environ["PROJECT_ID"]
+    ALLOYDB_SECRET_NAME = os.environ["ALLOYDB_SECRET_NAME"]
+
+    secret_manager_client = secretmanager_v1.SecretManagerServiceClient()
+    secret_name = secret_manager_client.secret_version_path(project=PROJECT_ID, secret=ALLOYDB_SECRET_NAME, secret_version="latest")
+    secret_request = secretmanager_v1.AccessSecretVersionRequest(name=secret_name)
+    secret_response = secret_manager_client.access_secret_version(request=secret_request)
+    PGPASSWORD = secret_response.payload.data.decode("UTF-8").strip()
+
+    return dict(
+        project_id=PROJECT_ID,
+        region=os.environ["REGION"],
+        cluster=os.environ["ALLOYDB_CLUSTER_NAME"],
+        instance=os.environ["ALLOYDB_INSTANCE_NAME"],
+        database=os.environ["ALLOYDB_DATABASE_NAME"],
+        user="postgres",
+        password=PGPASSWORD
+    )
+
+
+def create_vectorstore():
+    # Create a synchronous connection to our vectorstore
+    engine = AlloyDBEngine.from_instance(**alloydb_settings())
+    return AlloyDBVectorStore.create_sync(
+        engine=engine,
+        table_name=os.environ["ALLOYDB_TABLE_NAME"],
+        embedding_service=GoogleGenerativeAIEmbeddings(model="models/embedding-001"),
+        **VECTORSTORE_COLUMNS
+    )
+
+
+async def acreate_vectorstore():
+    # Same vectorstore, created through the engine's async API
+    engine = await AlloyDBEngine.afrom_instance(**alloydb_settings())
+    return await AlloyDBVectorStore.create(
+        engine=engine,
+        table_name=os.environ["ALLOYDB_TABLE_NAME"],
+        embedding_service=GoogleGenerativeAIEmbeddings(model="models/embedding-001"),
+        **VECTORSTORE_COLUMNS
+    )
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
 
-    @app.route("/", methods=['POST'])
-    def talkToGemini():
-        print("Beginning RAG call")
-        prompt = request.json['message']
-        prompt = unquote(prompt)
 
+def sse_event(data, event=None):
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(data)}\n\n"
+
+
+def room_message(image):
+    return HumanMessage(
+        content=[
+            {
+                "type": "text",
+                "text": ROOM_DESCRIPTION_PROMPT,
+            },
+            {"type": "image_url", "image_url": image},
+        ]
+    )
+
+
+def request_categories(body):
+    """Categories to search in: the request's `categories`, else RETRIEVAL_CATEGORIES."""
+    categories = body.get('categories')
+    if categories is None:
+        return RETRIEVAL_CATEGORIES
+    if isinstance(categories, str):
+        categories = categories.split(",")
+    if not isinstance(categories, list):
+        raise ValueError("categories must be a list of category names")
+    categories = [str(c).strip().lower() for c in categories if str(c).strip()]
+    for category in categories:
+        if not re.fullmatch(r"[a-z0-9 -]+", category):
+            raise ValueError(f"Invalid category: {category}")
+    return categories
+
+
+def categories_filter(categories):
+    """
+    Vectorstore filter (a SQL WHERE clause) matching products in any of the
+    categories. The categories column holds comma-separated names.
+    """
+    if not categories:
+        return None
+    clauses = []
+    for category in categories:
+        clauses += [
+            {"categories": {"$eq": category}},
+            {"categories": {"$like": f"{category},%"}},
+            {"categories": {"$like": f"%,{category}"}},
+            {"categories": {"$like": f"%,{category},%"}},
+        ]
+    return {"$or": clauses}
+
+
+def results_key(embedding, k, search_filter):
+    return (vector_key(embedding), k, json.dumps(search_filter, sort_keys=True))
+
+
+def vector_search_prompt_for(prompt, description_response):
+    return f""" This is the user's request: {prompt} Find the most relevant items for that prompt, while matching style of the room described here: {description_response} """
+
+
+def relevant_docs_for(docs):
+    #Prepare relevant documents for inclusion in final prompt
+    relevant_docs, stats = build_context(docs, CONTEXT_TOKEN_BUDGET, CONTEXT_DESCRIPTION_CHARS,
+                                         CONTEXT_DEDUPE_THRESHOLD)
+    print(f"Prompt context: {stats}")
+    return relevant_docs
+
+
+def build_design_prompt(prompt, description_response, relevant_docs):
+    # Step 3 – Tie it all together by augmenting our call to Gemini-pro
+    design_prompt = (
+        f" You are an interior designer that works for Online Boutique. You are tasked with providing recommendations to a customer on what they should add to a given room from our catalog. This is the description of the room: \n"
+        f"{description_response} Here are a list of products that are relevant to it: \n{relevant_docs}\n Specifically, this is what the customer has asked for, see if you can accommodate it: {prompt} Start by repeating a brief description of the room's design to the customer, then provide your recommendations. Do your best to pick the most relevant item out of the list of products provided, but if none of them seem relevant, then say that instead of inventing a new product. At the end of the response, add a list of the IDs of the relevant products in the following format for the top 3 results: [<first product ID>], [<second product ID>], [<third product ID>] ")
+    print("Final design prompt: ")
+    print(design_prompt)
+    return design_prompt
+
+
+class ShoppingAssistant:
+    """
+    The three RAG steps (room description, similarity search, design answer)
+    over a vectorstore and two chat models, with blocking methods for the
+    Flask app and async ones for the ASGI app. The Gemini clients are
+    created once and shared by all requests.
+    """
+
+    def __init__(self, vectorstore, llm_vision=None, llm=None):
+        self.vectorstore = vectorstore
+        self.llm_vision = llm_vision or ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+        self.llm = llm or ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+        # Follow-up messages usually send the same room photo again
+        self.room_descriptions = TTLCache(ROOM_CACHE_MAX_ENTRIES, ROOM_CACHE_TTL_SECONDS)
+        self.query_embeddings = EmbeddingCache(vectorstore.embeddings, EMBEDDING_CACHE_MAX_ENTRIES,
+                                               EMBEDDING_CACHE_TTL_SECONDS, EMBEDDING_CACHE_NEAR_THRESHOLD)
+        self.search_results = TTLCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS)
+
+    def describe_room(self, image):
         # Step 1 – Get a room description from Gemini-vision-pro
-        llm_vision = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
-        message = HumanMessage(
-            content=[
-                {
-                    "type": "text",
-                    "text": "You are a professional interior designer, give me a detailed decsription of the style of the room in this image",
-                },
-                {"type": "image_url", "image_url": request.json['image']},
-            ]
-        )
-        response = llm_vision.invoke([message])
+        key = image_key(image)
+        description = self.room_descriptions.get(key)
+        if description is not None:
+            print("Description step: cached")
+            return description
+        response = self.llm_vision.invoke([room_message(image)])
         print("Description step:")
         print(response)
-        description_response = response.content
+        self.room_descriptions.set(key, response.content)
+        return response.content
 
+    async def adescribe_room(self, image):
+        key = image_key(image)
+        description = self.room_descriptions.get(key)
+        if description is not None:
+            print("Description step: cached")
+            return description
+        response = await self.llm_vision.ainvoke([room_message(image)])
+        print("Description step:")
+        print(response)
+        self.room_descriptions.set(key, response.content)
+        return response.content
+
+    def stats(self):
+        return {
+            "room_descriptions": self.room_descriptions.stats(),
+            "query_embeddings": self.query_embeddings.stats(),
+            "search_results": self.search_results.stats(),
+        }
+
+    def search(self, query, categories):
+        embedding = self.query_embeddings.embed_query(query)
+        search_filter = categories_filter(categories)
+        key = results_key(embedding, RETRIEVAL_K, search_filter)
+        docs = self.search_results.get(key)
+        if docs is None:
+            docs = self.vectorstore.similarity_search_by_vector(embedding, k=RETRIEVAL_K, filter=search_filter)
+            self.search_results.set(key, docs)
+        return docs
+
+    async def asearch(self, query, categories):
+        embedding = await self.query_embeddings.aembed_query(query)
+        search_filter = categories_filter(categories)
+        key = results_key(embedding, RETRIEVAL_K, search_filter)
+        docs = self.search_results.get(key)
+        if docs is None:
+            docs = await self.vectorstore.asimilarity_search_by_vector(embedding, k=RETRIEVAL_K, filter=search_filter)
+            self.search_results.set(key, docs)
+        return docs
+
+    def find_relevant_docs(self, prompt, description_response, categories=()):
         # Step 2 – Similarity search with the description & user prompt
-        vector_search_prompt = f""" This is the user's request: {prompt} Find the most relevant items for that prompt, while matching style of the room described here: {description_response} """
+        vector_search_prompt = vector_search_prompt_for(prompt, description_response)
         print(vector_search_prompt)
+        docs = self.search(vector_search_prompt, categories)
+        print(f"Retrieved documents: {len(docs)}")
+        return relevant_docs_for(docs)
 
-        docs = vectorstore.similarity_search(vector_search_prompt)
-        print(f"Vector search: {description_response}")
+    async def afind_relevant_docs(self, prompt, description_response, categories=()):
+        vector_search_prompt = vector_search_prompt_for(prompt, description_response)
+        print(vector_search_prompt)
+        docs = await self.asearch(vector_search_prompt, categories)
         print(f"Retrieved documents: {len(docs)}")
-        #Prepare relevant documents for inclusion in final prompt
-        relevant_docs = ""
-        for doc in docs:
-            doc_details = doc.to_json()
-            print(f"Adding relevant document to prompt context: {doc_details}")
-            relevant_docs += str(doc_details) + ", "
-
-        # Step 3 – Tie it all together by augmenting our call to Gemini-pro
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
-        design_prompt = (
-            f" You are an interior designer that works for Online Boutique. You are tasked with providing recommendations to a customer on what they should add to a given room from our catalog. This is the description of the room: \n"
-            f"{description_response} Here are a list of products that are relevant to it: {relevant_docs} Specifically, this is what the customer has asked for, see if you can accommodate it: {prompt} Start by repeating a brief description of the room's design to the customer, then provide your recommendations. Do your best to pick the most relevant item out of the list of products provided, but if none of them seem relevant, then say that instead of inventing a new product. At the end of the response, add a list of the IDs of the relevant products in the following format for the top 3 results: [<first product ID>], [<second product ID>], [<third product ID>] ")
-        print("Final design prompt: ")
-        print(design_prompt)
-        design_response = llm.invoke(
-            design_prompt
-        )
-
-        data = {'content': design_response.content}
-        return data
+        return relevant_docs_for(docs)
+
+    def design_prompt(self, prompt, image, started, timings, categories=()):
+        description_response = self.describe_room(image)
+        timings["description_ms"] = elapsed_ms(started)
+        relevant_docs = self.find_relevant_docs(prompt, description_response, categories)
+        timings["retrieval_ms"] = round(elapsed_ms(started) - timings["description_ms"], 1)
+        return build_design_prompt(prompt, description_response, relevant_docs)
+
+    async def adesign_prompt(self, prompt, image, started, timings, categories=()):
+        description_response = await self.adescribe_room(image)
+        timings["description_ms"] = elapsed_ms(started)
+        relevant_docs = await self.afind_relevant_docs(prompt, description_response, categories)
+        timings["retrieval_ms"] = round(elapsed_ms(started) - timings["description_ms"], 1)
+        return build_design_prompt(prompt, description_response, relevant_docs)
+
+    def answer(self, prompt, image, categories=()):
+        started = time.perf_counter()
+        timings = {}
+        design_prompt = self.design_prompt(prompt, image, started, timings, categories)
+        design_response = self.llm.invoke(design_prompt)
+        # Without streaming the first token arrives with the whole answer
+        timings["ttft_ms"] = timings["total_ms"] = elapsed_ms(started)
+        print(f"RAG call timings: {timings}")
+        return {'content': design_response.content, 'details': {'timings': timings}}
+
+    async def aanswer(self, prompt, image, categories=()):
+        started = time.perf_counter()
+        timings = {}
+        design_prompt = await self.adesign_prompt(prompt, image, started, timings, categories)
+        design_response = await self.llm.ainvoke(design_prompt)
+        timings["ttft_ms"] = timings["total_ms"] = elapsed_ms(started)
+        print(f"RAG call timings: {timings}")
+        return {'content': design_response.content, 'details': {'timings': timings}}
+
+    def stream_events(self, design_prompt, started, timings):
+        # Send the answer as Server-Sent Events while Gemini generates it,
+        # then a final "done" event with the timings
+        try:
+            for chunk in self.llm.stream(design_prompt):
+                if not chunk.content:
+                    continue
+                if "ttft_ms" not in timings:
+                    timings["ttft_ms"] = elapsed_ms(started)
+                yield sse_event({"content": chunk.content})
+        except Exception as e:
+            print(f"Streaming failed: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        yield self._done_event(started, timings)
+
+    async def astream_events(self, design_prompt, started, timings):
+        try:
+            async for chunk in self.llm.astream(design_prompt):
+                if not chunk.content:
+                    continue
+                if "ttft_ms" not in timings:
+                    timings["ttft_ms"] = elapsed_ms(started)
+                yield sse_event({"content": chunk.content})
+        except Exception as e:
+            print(f"Streaming failed: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        yield self._done_event(started, timings)
+
+    def _done_event(self, started, timings):
+        timings.setdefault("ttft_ms", elapsed_ms(started))
+        timings["total_ms"] = elapsed_ms(started)
+        print(f"RAG call timings: {timings}")
+        return sse_event({"timings": timings}, event="done")
+
+
+def wants_stream(body, accept):
+    if body.get('stream'):
+        return True
+    return "text/event-stream" in accept
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def create_app(assistant=None):
+    app = Flask(__name__)
+    assistant = assistant or ShoppingAssistant(create_vectorstore())
+
+    @app.route("/", methods=['POST'])
+    def talkToGemini():
+        print("Beginning RAG call")
+        prompt = request.json['message']
+        prompt = unquote(prompt)
+        try:
+            categories = request_categories(request.json)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        if not wants_stream(request.json, request.headers.get("Accept", "")):
+            return assistant.answer(prompt, request.json['image'], categories)
+
+        started = time.perf_counter()
+        timings = {}
+        design_prompt = assistant.design_prompt(prompt, request.json['image'], started, timings, categories)
+        return Response(stream_with_context(assistant.stream_events(design_prompt, started, timings)),
+                        mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    @app.route("/stats", methods=['GET'])
+    def stats():
+        return assistant.stats()
+
+    return app
+
+
+def create_asgi_app(assistant_factory=None):
+    """
+    The same API served asynchronously: the RAG steps of concurrent requests
+    wait on Gemini and AlloyDB without holding a thread each.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if assistant_factory is not None:
+            app.state.assistant = await assistant_factory()
+        else:
+            app.state.assistant = ShoppingAssistant(await acreate_vectorstore())
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/")
+    async def talkToGemini(request: Request):
+        print("Beginning RAG call")
+        assistant = request.app.state.assistant
+        body = await request.json()
+        prompt = unquote(body['message'])
+        try:
+            categories = request_categories(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not wants_stream(body, request.headers.get("accept", "")):
+            return await assistant.aanswer(prompt, body['image'], categories)
+
+        started = time.perf_counter()
+        timings = {}
+        design_prompt = await assistant.adesign_prompt(prompt, body['image'], started, timings, categories)
+        return StreamingResponse(assistant.astream_events(design_prompt, started, timings),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        return request.app.state.assistant.stats()
 
     return app
 
 if __name__ == "__main__":
-    # Create an instance of flask server when called directly
-    app = create_app()
-    app.run(host='0.0.0.0', port=8080)
+    if SERVING_MODE == "asgi":
+        import uvicorn
+        uvicorn.run(create_asgi_app(), host='0.0.0.0', port=8080)
+    else:
+        # Create an instance of flask server when called directly
+        app = create_app()
+        app.run(host='0.0.0.0', port=8080)